@@ -1,9 +1,16 @@
 from flask import Flask
-from .extensions import db, migrate, login_manager
+from .extensions import db, login_manager, init_migrate
 from .routes import main_bp
+from .cache import init_cache
+from .identity import init_identity_cache
+from .metrics import init_metrics
+from .changes import init_changes
+from .compression import init_compression
+from .fragments import init_fragments
+from .replicas import init_replicas
+from .assets import init_assets
 import os
 from dotenv import load_dotenv
-import json
 
 
 def create_app():
@@ -13,10 +20,56 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'unsafe-dev-key')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///dev.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Réplicas de leitura (app/replicas.py), separadas por vírgula; vazio = tudo no primário
+    replica_urls = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+    app.config['SQLALCHEMY_BINDS'] = {f'replica{i}': url for i, url in enumerate(replica_urls)}
+    app.config['REPLICA_CHECK_SECONDS'] = float(os.getenv('REPLICA_CHECK_SECONDS', '10'))
+    app.config['REPLICA_STICKY_SECONDS'] = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+    # Limite dos uploads (importação em massa)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', '50')) * 1024 * 1024
+    app.config['TICKETS_PAGE_SIZE'] = int(os.getenv('TICKETS_PAGE_SIZE', '50'))
+    # 'auto' usa FULLTEXT/FTS5 quando a tabela tickets_search existe; 'like' força ILIKE
+    app.config['SEARCH_BACKEND'] = os.getenv('SEARCH_BACKEND', 'auto')
+    # Cache da listagem: memory:// (um worker), file:///dir ou redis://... (vários), null:// desativa
+    app.config['RESULT_CACHE_URL'] = os.getenv('RESULT_CACHE_URL', 'memory://')
+    app.config['RESULT_CACHE_TTL'] = int(os.getenv('RESULT_CACHE_TTL', '30'))
+    app.config['RESULT_CACHE_MAX_ENTRIES'] = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '256'))
+    app.config['IDENTITY_CACHE_TTL'] = int(os.getenv('IDENTITY_CACHE_TTL', '60'))
+    app.config['IDENTITY_CACHE_MAX_ENTRIES'] = int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', '4096'))
+    # Instrumentação por requisição e /metrics (app/metrics.py); 0 desliga o log de lentas
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') == '1'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    app.config['METRICS_SLOW_MS'] = int(os.getenv('METRICS_SLOW_MS', '500'))
+    app.config['METRICS_N_PLUS_ONE'] = int(os.getenv('METRICS_N_PLUS_ONE', '10'))
+    # `flask purge`: idade (dias sem atualização) a partir da qual chamados fechados são removidos
+    app.config['RETENTION_DAYS'] = int(os.getenv('RETENTION_DAYS', '365'))
+    # Cache das linhas renderizadas da listagem (app/fragments.py), por processo
+    app.config['ROW_CACHE_MAX_ENTRIES'] = int(os.getenv('ROW_CACHE_MAX_ENTRIES', '5000'))
+    app.config['ROW_CACHE_MAX_BYTES'] = int(os.getenv('ROW_CACHE_MAX_MB', '8')) * 1024 * 1024
+    # Feed de alterações + SSE (app/changes.py): intervalo de leitura, retenção e duração máxima de cada stream
+    app.config['CHANGE_FEED_POLL'] = float(os.getenv('CHANGE_FEED_POLL', '1.0'))
+    app.config['CHANGE_FEED_RETENTION_MINUTES'] = int(os.getenv('CHANGE_FEED_RETENTION_MINUTES', '60'))
+    app.config['SSE_MAX_SECONDS'] = int(os.getenv('SSE_MAX_SECONDS', '300'))
+    # Com workers síncronos o /events não fica aberto: responde e o navegador reconecta após este intervalo
+    app.config['SSE_SYNC_RETRY_SECONDS'] = int(os.getenv('SSE_SYNC_RETRY_SECONDS', '5'))
+    # Compressão gzip/brotli das respostas HTML/CSV/JSON a partir de COMPRESS_MIN_SIZE bytes (app/compression.py)
+    app.config['COMPRESS_ENABLED'] = os.getenv('COMPRESS_ENABLED', '1') == '1'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    # Verificação local dos ID tokens do Firebase (app/firebase_auth.py)
+    app.config['FIREBASE_PROJECT_ID'] = os.getenv('FIREBASE_PROJECT_ID')
 
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_replicas(app)
+    if os.getenv('FLASK_RUN_FROM_CLI') == 'true':
+        init_migrate(app)
     login_manager.init_app(app)
+    init_cache(app)
+    init_identity_cache(app)
+    init_metrics(app)
+    init_changes(app)
+    init_fragments(app)
+    init_compression(app)
+    init_assets(app)
 
     # Importar modelos para registrar metadata nas migrações
     from . import models  # noqa: F401
@@ -47,25 +100,31 @@ def create_app():
             }
         }
 
-    # Inicializar Firebase Admin (verificação de ID token no backend)
-    app.config['FIREBASE_ADMIN_READY'] = False
-    try:
-        import firebase_admin  # type: ignore
-        from firebase_admin import credentials  # type: ignore
-        cred_json = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON')
-        cred_path = os.getenv('FIREBASE_SERVICE_ACCOUNT_FILE')
-        cred = None
-        if cred_json:
-            cred = credentials.Certificate(json.loads(cred_json))
-        elif cred_path and os.path.exists(cred_path):
-            cred = credentials.Certificate(cred_path)
-        if cred and not firebase_admin._apps:
-            firebase_admin.initialize_app(cred)
-            app.config['FIREBASE_ADMIN_READY'] = True
-    except Exception:
-        # Sem credenciais ou pacote não instalado; login Google ficará inativo no backend
-        pass
-
     app.register_blueprint(main_bp)
+    from .api import api_bp
+    app.register_blueprint(api_bp)
+
+    from .search import search_cli
+    from .outbox import outbox_cli, start_worker_thread
+    from .digest import digest_cli
+    from .stats import stats_cli
+    from .seed import seed_command
+    from .importer import import_command
+    from .retention import purge_command
+    from .vendors import vendors_cli
+    from .assets import assets_cli
+    app.cli.add_command(search_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(digest_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(import_command)
+    app.cli.add_command(purge_command)
+    app.cli.add_command(vendors_cli)
+    app.cli.add_command(assets_cli)
+
+    # Worker do outbox no próprio processo; em produção prefira `flask outbox worker`
+    if os.getenv('OUTBOX_WORKER_THREAD') == '1':
+        start_worker_thread(app)
 
     return app
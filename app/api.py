@@ -0,0 +1,196 @@
+"""API JSON versionada (`/api/v1`) para integrações.
+
+Autenticação pela sessão do Flask-Login (sem sessão: 401 em JSON). As
+respostas de leitura levam ETag forte calculado por uma consulta indexada
+(maior seq de `ticket_changes` do escopo ou do chamado) feita antes de montar
+o corpo; com `If-None-Match` igual, a resposta é 304 sem buscar nem
+serializar nada.
+"""
+import hashlib
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+
+from flask import Blueprint, current_app, jsonify, request, url_for
+from flask_login import current_user
+from sqlalchemy import func, select
+
+from .extensions import db
+from .models import Interaction, Ticket, TicketChange, STALE_HOURS
+from .queries import INTERACTIONS_PER_PAGE, TicketQuery, interaction_page, invalidate_tickets
+
+API_VERSION = 'v1'
+MAX_PER_PAGE = 200
+
+api_bp = Blueprint('api_v1', __name__, url_prefix=f'/api/{API_VERSION}')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_bp.errorhandler(ApiError)
+def _api_error(exc):
+    return jsonify({'error': exc.message}), exc.status
+
+
+@api_bp.before_request
+def _require_login():
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'unauthorized'}), 401
+
+
+def _dt(value):
+    return value.isoformat() if value else None
+
+
+def _stale_after(status, last_contact_at, created_at):
+    # Momento em que o chamado passa a "sem interação há 24h"; não depende da hora da consulta
+    if status == 'fechado':
+        return None
+    return _dt((last_contact_at or created_at) + timedelta(hours=STALE_HOURS))
+
+
+def _etag(*parts):
+    raw = repr((API_VERSION,) + parts).encode()
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _conditional(etag, build):
+    """304 se o cliente já tem `etag`; senão chama `build()` e anexa o ETag."""
+    # Forma fraca: com gzip/brotli o ETag enviado vira W/"..." (app/compression.py)
+    if request.if_none_match.contains_weak(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = build()
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    resp.vary.add('Cookie')
+    return resp
+
+
+def _ticket_row(row):
+    data = asdict(row)
+    for key in ('created_at', 'updated_at', 'last_contact_at'):
+        data[key] = _dt(data[key])
+    data['stale_after'] = _stale_after(row.status, row.last_contact_at, row.created_at)
+    return data
+
+
+def _interaction(i):
+    return {'id': i.id, 'ticket_id': i.ticket_id, 'author': i.author, 'content': i.content,
+            'created_at': _dt(i.created_at)}
+
+
+def _per_page(default=None):
+    try:
+        per_page = int(request.args.get('per_page', default or current_app.config['TICKETS_PAGE_SIZE']))
+    except ValueError:
+        raise ApiError('per_page inválido')
+    return min(max(per_page, 1), MAX_PER_PAGE)
+
+
+@api_bp.get('/tickets')
+def tickets_list():
+    """Filtros `q` e `status`; paginação por `after`/`before` (cursores devolvidos na resposta)."""
+    spec = TicketQuery.for_user(current_user, request.args, _per_page())
+    etag = _etag('tickets', spec, spec.version())
+
+    def build():
+        # Sem o cache de resultados: o corpo precisa corresponder ao ETag recém-calculado
+        page = spec.fetch_page()
+        return jsonify({
+            'items': [_ticket_row(t) for t in page.items],
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+        })
+    return _conditional(etag, build)
+
+
+def _ticket_version(ticket_id):
+    # O seq do feed muda a cada escrita, mesmo com updated_at igual (DATETIME do MySQL sem frações)
+    last_change = (select(func.max(TicketChange.seq)).where(TicketChange.ticket_id == ticket_id)
+                   .scalar_subquery())
+    row = db.session.execute(
+        select(Ticket.created_by, Ticket.updated_at, func.max(Interaction.id), func.count(Interaction.id),
+               last_change)
+        .outerjoin(Interaction, Interaction.ticket_id == Ticket.id)
+        .where(Ticket.id == ticket_id)
+        .group_by(Ticket.id, Ticket.created_by, Ticket.updated_at)
+    ).first()
+    if row is None:
+        raise ApiError('not found', 404)
+    if current_user.role != 'admin' and row.created_by != current_user.id:
+        raise ApiError('forbidden', 403)
+    return tuple(row)
+
+
+@api_bp.get('/tickets/<int:ticket_id>')
+def ticket_detail(ticket_id):
+    """Interações paginadas, mais recentes primeiro: `per_page` e `after` (o `next_cursor` da resposta)."""
+    after = request.args.get('after', '')
+    per_page = _per_page(INTERACTIONS_PER_PAGE)
+    etag = _etag('ticket', ticket_id, after, per_page, _ticket_version(ticket_id))
+
+    def build():
+        ticket = db.session.get(Ticket, ticket_id)
+        page = interaction_page(ticket_id, after=after, per_page=per_page)
+        return jsonify({
+            'id': ticket.id,
+            'title': ticket.title,
+            'description': ticket.description,
+            'status': ticket.status,
+            'priority': ticket.priority,
+            'vendor': ticket.vendor,
+            'assignee': ticket.assignee,
+            'created_by': ticket.created_by,
+            'created_at': _dt(ticket.created_at),
+            'updated_at': _dt(ticket.updated_at),
+            'last_contact_at': _dt(ticket.last_contact_at),
+            'last_vendor_contact_at': _dt(ticket.last_vendor_contact_at),
+            'stale_after': _stale_after(ticket.status, ticket.last_contact_at, ticket.created_at),
+            'interactions': [_interaction(i) for i in page.items],
+            'next_cursor': page.next_cursor,
+        })
+    return _conditional(etag, build)
+
+
+def _parse_datetime(value):
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError('created_at inválido (use ISO 8601)')
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+@api_bp.post('/tickets/<int:ticket_id>/interactions')
+def interaction_create(ticket_id):
+    """Corpo JSON: {"content": ..., "author": ..., "created_at": opcional, ISO 8601}."""
+    # Exigir JSON também impede POST de formulário de outro site com o cookie de sessão
+    if not request.is_json:
+        raise ApiError('Content-Type deve ser application/json', 415)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ApiError('JSON inválido')
+    content = (data.get('content') or '').strip()
+    author = (data.get('author') or '').strip()
+    if not content or not author:
+        raise ApiError('content e author são obrigatórios')
+    if len(author) > 120:
+        raise ApiError('author excede 120 caracteres')
+    created_at = _parse_datetime(data['created_at']) if data.get('created_at') else datetime.utcnow()
+
+    created_by = _ticket_version(ticket_id)[0]
+    inter = Interaction(ticket_id=ticket_id, content=content, author=author, created_at=created_at)
+    db.session.add(inter)
+    db.session.commit()
+    invalidate_tickets(created_by)
+
+    resp = jsonify(_interaction(inter))
+    resp.status_code = 201
+    resp.headers['Location'] = url_for('api_v1.ticket_detail', ticket_id=ticket_id)
+    return resp
@@ -0,0 +1,130 @@
+"""Arquivos estáticos com hash no nome e pré-comprimidos.
+
+`flask assets build` copia cada arquivo de app/static para app/static/dist
+com o hash do conteúdo no nome (style.3f2a1c9e04b7.css), grava as versões
+.gz e .br (esta se o pacote `brotli` estiver instalado) e o manifest.json.
+Nos templates, `asset_url('style.css')` aponta para a versão com hash; sem
+build, cai no arquivo original. Como o conteúdo de uma URL com hash nunca
+muda, ela é servida com cache de um ano (`immutable`), escolhendo a versão
+pré-comprimida pelo Accept-Encoding.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+from .compression import _brotli
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Tipos que já vêm comprimidos não ganham nada com gzip/brotli
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.ico'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _sources(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != os.path.join(static_folder, DIST)]
+        for name in files:
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+
+def _hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def build(static_folder, clean=False):
+    """Gera dist/ e o manifest; retorna o manifest {original: nome com hash}."""
+    dist = os.path.join(static_folder, DIST)
+    brotli = _brotli()
+    manifest = {}
+    for name, path in sorted(_sources(static_folder)):
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        hashed = _hashed_name(name, data)
+        manifest[name] = hashed
+        target = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            continue  # mesmo conteúdo já gerado num build anterior
+        shutil.copyfile(path, target)
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        with open(target + '.gz', 'wb') as fh:
+            # mtime=0: mesmo conteúdo gera o mesmo .gz em qualquer build
+            with gzip.GzipFile(fileobj=fh, mode='wb', compresslevel=9, mtime=0) as gz:
+                gz.write(data)
+        if brotli is not None:
+            with open(target + '.br', 'wb') as fh:
+                fh.write(brotli.compress(data, quality=11))
+    with open(os.path.join(dist, MANIFEST), 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    if clean:
+        keep = set(manifest.values()) | {MANIFEST}
+        for name, path in _sources(dist):
+            base = name[:-3] if name.endswith(('.gz', '.br')) else name
+            if base not in keep:
+                os.remove(path)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(filename):
+    hashed = current_app.extensions['asset_manifest'].get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('asset', filename=hashed)
+
+
+def serve_asset(filename):
+    folder = os.path.join(current_app.static_folder, DIST)
+    accepted = request.accept_encodings
+    encoding, suffix = None, ''
+    for name, ext in ENCODINGS:
+        if accepted[name] and os.path.isfile(os.path.join(folder, filename + ext)):
+            encoding, suffix = name, ext
+            break
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    resp = send_from_directory(folder, filename + suffix, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.vary.add('Accept-Encoding')
+    resp.headers['Cache-Control'] = IMMUTABLE
+    return resp
+
+
+def init_assets(app):
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+    app.jinja_env.globals['asset_url'] = asset_url
+    # Mais específica que /static/<path:filename>, então tem precedência
+    app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>', 'asset', serve_asset)
+
+
+assets_cli = AppGroup('assets', help='Arquivos estáticos com hash e pré-comprimidos.')
+
+
+@assets_cli.command('build')
+@click.option('--clean', is_flag=True, help='Remove de dist/ o que não está no manifest novo.')
+def build_command(clean):
+    """Gera app/static/dist com nomes por hash, .gz/.br e manifest.json."""
+    manifest = build(current_app.static_folder, clean)
+    if _brotli() is None:
+        click.echo('Pacote brotli não instalado: gerando só .gz', err=True)
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f'{name} -> {DIST}/{hashed}')
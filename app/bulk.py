@@ -0,0 +1,152 @@
+"""Ações em massa na listagem de chamados.
+
+Um único UPDATE (ou DELETE) `WHERE id IN (...)` limitado aos chamados que o
+usuário pode editar, na mesma transação que ajusta os derivados que os
+eventos de sessão manteriam (ticket_stats, último contato e índice de busca
+quando muda a terceirizada) e enfileira as notificações de status, uma por
+criador listando todos os seus chamados alterados.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from markupsafe import escape
+from sqlalchemy import delete, select, update
+
+from .changes import record
+from .extensions import db
+from .models import Ticket, User, refresh_contact_columns
+from .outbox import enqueue_email, enqueue_whatsapp
+from .queries import invalidate_tickets
+from .search import get_backend
+from .stats import DIMENSIONS, apply_deltas, _key
+from .vendors import VendorResolver
+
+BULK_MAX = 1000
+FIELDS = ('status', 'priority', 'assignee', 'vendor')
+WHATSAPP_MAX_ITEMS = 10
+
+
+@dataclass
+class BulkResult:
+    changed: int = 0
+    skipped: int = 0  # inexistentes ou sem permissão
+    notified: int = 0
+    creators: set = field(default_factory=set)
+
+
+def _editable(user, ids):
+    """Chamados de `ids` que `user` pode alterar, com os valores atuais e o criador (travados até o commit)."""
+    stmt = (select(Ticket.id, Ticket.title, Ticket.created_by, Ticket.status, Ticket.priority,
+                   Ticket.vendor, Ticket.assignee, User.email, User.phone_e164)
+            .join(User, User.id == Ticket.created_by)
+            .where(Ticket.id.in_(ids))
+            .with_for_update(of=Ticket))
+    if user.role != 'admin':
+        stmt = stmt.where(Ticket.created_by == user.id)
+    return db.session.execute(stmt).all()
+
+
+def _notify_status(rows, new_status):
+    """Uma mensagem por criador com todos os seus chamados que mudaram de status."""
+    per_creator = {}
+    for r in rows:
+        if r.status != new_status:
+            per_creator.setdefault((r.created_by, r.email, r.phone_e164), []).append(r)
+    for (_, email, phone), tickets in per_creator.items():
+        items = ''.join(f'<li>#{t.id} - {escape(t.title)}: {escape(t.status)} → {escape(new_status)}</li>'
+                        for t in tickets)
+        if len(tickets) == 1:
+            subj = f'Chamado #{tickets[0].id} atualizado para {new_status}'
+        else:
+            subj = f'{len(tickets)} chamados atualizados para {new_status}'
+        enqueue_email(email, subj, f'<p>Seus chamados mudaram de status:</p><ul>{items}</ul>')
+        if phone:
+            listed = ', '.join(f'#{t.id}' for t in tickets[:WHATSAPP_MAX_ITEMS])
+            more = f' e mais {len(tickets) - WHATSAPP_MAX_ITEMS}' if len(tickets) > WHATSAPP_MAX_ITEMS else ''
+            enqueue_whatsapp(phone.lstrip('+'), f'Chamados {listed}{more}: status → {new_status}')
+    return len(per_creator)
+
+
+def _unique(ids):
+    ids = sorted(set(ids))
+    if len(ids) > BULK_MAX:
+        # Nada é alterado: truncar deixaria parte da seleção de fora sem aviso
+        raise ValueError(f'no máximo {BULK_MAX} chamados por vez ({len(ids)} enviados)')
+    return ids
+
+
+def bulk_update(user, ids, values):
+    """Aplica `values` ({campo: valor}, campos de FIELDS) aos chamados `ids` permitidos.
+
+    Mais de BULK_MAX ids: ValueError, sem alterar nenhum.
+    """
+    values = {k: v for k, v in values.items() if k in FIELDS}
+    if not values:
+        raise ValueError('nenhum campo para alterar')
+    if 'assignee' in values and user.role != 'admin':
+        raise PermissionError('apenas administradores alteram o responsável')
+    ids = _unique(ids)
+    search = get_backend(db.engine)  # antes de escrever (no SQLite a inspeção usa outra conexão)
+
+    rows = _editable(user, ids)
+    result = BulkResult(skipped=len(ids) - len(rows))
+    if not rows:
+        db.session.rollback()
+        return result
+    target = [r.id for r in rows]
+    connection = db.session.connection()
+    if 'vendor' in values:
+        values['vendor_id'] = VendorResolver(connection).ensure(values['vendor'])
+    db.session.execute(
+        update(Ticket).where(Ticket.id.in_(target)).values(**values, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False},
+    )
+
+    deltas = Counter()
+    for r in rows:
+        for dim in DIMENSIONS:
+            if dim in values and _key(getattr(r, dim)) != _key(values[dim]):
+                deltas[(dim, _key(getattr(r, dim)))] -= 1
+                deltas[(dim, _key(values[dim]))] += 1
+    apply_deltas(connection, deltas)
+    if 'vendor' in values:
+        refresh_contact_columns(connection, target)
+        search.reindex(connection, target)
+    record(connection, [(r.id, r.created_by, 'ticket') for r in rows])
+    if 'status' in values:
+        result.notified = _notify_status(rows, values['status'])
+    db.session.commit()
+
+    result.changed = len(rows)
+    result.creators = {r.created_by for r in rows}
+    invalidate_tickets(*result.creators)
+    return result
+
+
+def bulk_delete(user, ids):
+    ids = _unique(ids)
+    search = get_backend(db.engine)
+    rows = _editable(user, ids)
+    result = BulkResult(skipped=len(ids) - len(rows))
+    if not rows:
+        db.session.rollback()
+        return result
+    target = [r.id for r in rows]
+    # interações saem pelo ON DELETE CASCADE
+    db.session.execute(delete(Ticket).where(Ticket.id.in_(target)),
+                       execution_options={'synchronize_session': False})
+    deltas = Counter()
+    for r in rows:
+        for dim in DIMENSIONS:
+            deltas[(dim, _key(getattr(r, dim)))] -= 1
+    connection = db.session.connection()
+    apply_deltas(connection, deltas)
+    search.reindex(connection, target)  # remove as entradas
+    record(connection, [(r.id, r.created_by, 'delete') for r in rows])
+    db.session.commit()
+
+    result.changed = len(rows)
+    result.creators = {r.created_by for r in rows}
+    invalidate_tickets(*result.creators)
+    return result
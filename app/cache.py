@@ -0,0 +1,210 @@
+"""Cache de resultados com TTL, LRU e invalidação por escopo.
+
+Backend escolhido por `RESULT_CACHE_URL`:
+- `memory://` (padrão): dicionário no processo, para um único worker;
+- `file:///caminho`: arquivos pickle compartilhados entre workers da mesma máquina;
+- `redis://host:6379/0`: servidor Redis (requer o pacote `redis`);
+- `null://`: desativado.
+
+A invalidação não apaga chaves: cada escopo (ex.: `all`, `user:7`) tem um
+número de versão que faz parte da chave e é incrementado a cada escrita.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_ENTRIES = 256
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def version(self, scope):
+        return 0
+
+    def bump(self, scope):
+        pass
+
+
+class MemoryCache(NullCache):
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # chave -> (expira_em, valor)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def version(self, scope):
+        return self._versions.get(scope, 0)
+
+    def bump(self, scope):
+        with self._lock:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+
+
+class FileSystemCache(NullCache):
+    """Um arquivo por chave; LRU aproximado pelo mtime (atualizado a cada leitura)."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        fname = self._file(key)
+        try:
+            with open(fname, 'rb') as fh:
+                expires, value = pickle.load(fh)
+        except (OSError, EOFError, pickle.PickleError):
+            return None
+        if expires < time.time():
+            self._remove(fname)
+            return None
+        try:
+            os.utime(fname)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value, ttl):
+        fname = self._file(key)
+        tmp = f'{fname}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as fh:
+            pickle.dump((time.time() + ttl, value), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, fname)
+        self._evict()
+
+    def _remove(self, fname):
+        try:
+            os.remove(fname)
+        except OSError:
+            pass
+
+    def _evict(self):
+        try:
+            entries = [e for e in os.scandir(self.path) if e.name.endswith('.cache')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            self._remove(entry.path)
+
+    def _version_file(self, scope):
+        return os.path.join(self.path, 'v_' + hashlib.sha1(scope.encode()).hexdigest())
+
+    def version(self, scope):
+        try:
+            with open(self._version_file(scope)) as fh:
+                return int(fh.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump(self, scope):
+        # Incrementos concorrentes podem colidir, mas a versão sempre muda
+        fname = self._version_file(scope)
+        tmp = f'{fname}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as fh:
+            fh.write(str(self.version(scope) + 1))
+        os.replace(tmp, fname)
+
+
+class RedisCache(NullCache):
+    """TTL nativo do Redis; o LRU fica a cargo de `maxmemory-policy allkeys-lru`."""
+
+    def __init__(self, url, prefix='chamados:'):
+        import redis  # dependência opcional
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=max(1, int(ttl)))
+
+    def version(self, scope):
+        return int(self.client.get(f'{self.prefix}v:{scope}') or 0)
+
+    def bump(self, scope):
+        self.client.incr(f'{self.prefix}v:{scope}')
+
+
+def create_cache(url, max_entries=DEFAULT_MAX_ENTRIES):
+    if not url or url.startswith('memory://'):
+        return MemoryCache(max_entries)
+    if url.startswith('null://'):
+        return NullCache()
+    if url.startswith('file://'):
+        return FileSystemCache(url[len('file://'):], max_entries)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url)
+    raise ValueError(f'RESULT_CACHE_URL não suportada: {url}')
+
+
+def init_cache(app):
+    app.config.setdefault('RESULT_CACHE_TTL', DEFAULT_TTL)
+    app.config.setdefault('RESULT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+    app.extensions['result_cache'] = create_cache(app.config.get('RESULT_CACHE_URL'), app.config['RESULT_CACHE_MAX_ENTRIES'])
+
+
+def get_cache():
+    return current_app.extensions['result_cache']
+
+
+def cached(scopes, key, compute):
+    """Retorna o valor de `key` dentro dos `scopes`, calculando e gravando em caso de falta."""
+    cache = get_cache()
+    versions = ':'.join(f'{s}={cache.version(s)}' for s in scopes)
+    full_key = f'{key}|{versions}'
+    value = cache.get(full_key)
+    if value is None:
+        value = compute()
+        cache.set(full_key, value, current_app.config['RESULT_CACHE_TTL'])
+    return value
+
+
+def invalidate(*scopes):
+    cache = get_cache()
+    for scope in scopes:
+        cache.bump(scope)
@@ -0,0 +1,335 @@
+"""Feed de alterações de chamados e eventos SSE para as páginas abertas.
+
+Cada escrita grava linhas em `ticket_changes` (seq crescente) na mesma
+transação: os eventos de sessão cobrem o ORM e `record()` as escritas via
+Core (ações em massa, importação, retenção). Um `ChangeHub` por processo lê
+o feed a cada `CHANGE_FEED_POLL` segundos, o que funciona igual com um ou
+vários workers, e repassa as alterações às conexões de `/events`, que
+recebem só as linhas mudadas (já renderizadas) dos chamados que podem ver.
+"""
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context, render_template
+from sqlalchemy import delete, event, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .fragments import ticket_rows
+from .models import Interaction, Ticket, TicketChange
+from .pagination import Page
+from .queries import TicketRow
+
+POLL_BATCH = 500
+REPLAY_SIZE = 2000  # alterações recentes guardadas para reconexões com Last-Event-ID
+SUBSCRIBER_QUEUE = 1000
+PRUNE_EVERY = 300  # segundos
+GAP_TIMEOUT = 30  # segundos esperando um seq pulado (transação ainda aberta) antes de desistir
+
+
+@dataclass(frozen=True)
+class Change:
+    seq: int
+    ticket_id: int
+    created_by: int | None
+    kind: str  # ticket, interaction, delete
+    row: TicketRow | None = None  # estado atual (None em exclusões)
+    interaction: dict | None = None  # id, author, content, created_at
+
+    def visible_to(self, user_id):
+        """`user_id` None = admin (vê tudo)."""
+        return user_id is None or self.created_by == user_id
+
+
+def _with_creators(connection, changes):
+    """Completa o criador que veio None (interações): o feed é filtrado e versionado por ele."""
+    missing = {change[0] for change in changes if change[1] is None}
+    if not missing:
+        return changes
+    creators = dict(connection.execute(
+        select(Ticket.id, Ticket.created_by).where(Ticket.id.in_(missing))).all())
+    return [(t, creators.get(t) if c is None else c, *rest) for t, c, *rest in changes]
+
+
+def record(connection, changes):
+    """Grava no feed as alterações feitas via Core: [(ticket_id, created_by ou None, kind)]."""
+    changes = _with_creators(connection, changes)
+    rows = [{'ticket_id': t, 'created_by': c, 'kind': k, 'created_at': datetime.utcnow()} for t, c, k in changes]
+    if rows:
+        connection.execute(insert(TicketChange.__table__), rows)
+
+
+def last_seq():
+    # Sempre no primário: com a réplica atrasada além do REPLAY_SIZE, o /events
+    # responderia 'reset' a cada conexão e a página recarregaria sem parar
+    return db.session.scalar(select(func.max(TicketChange.seq)), bind_arguments={'bind': db.engine}) or 0
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault('ticket_changes', [])
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            pending.append((obj.id, obj.created_by, 'ticket', None))
+        elif isinstance(obj, Interaction):
+            pending.append((obj.ticket_id, None, 'interaction', obj.id))
+    for obj in session.dirty:
+        if isinstance(obj, Ticket) and session.is_modified(obj, include_collections=False):
+            pending.append((obj.id, obj.created_by, 'ticket', None))
+        elif isinstance(obj, Interaction) and session.is_modified(obj, include_collections=False):
+            pending.append((obj.ticket_id, None, 'interaction', obj.id))
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            pending.append((obj.id, obj.created_by, 'delete', None))
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _record_changes(session, flush_context):
+    pending = session.info.pop('ticket_changes', None)
+    if not pending:
+        return
+    now = datetime.utcnow()
+    connection = session.connection()
+    rows = [{'ticket_id': t, 'created_by': c, 'kind': k, 'interaction_id': i, 'created_at': now}
+            for t, c, k, i in _with_creators(connection, list(dict.fromkeys(pending)))]
+    connection.execute(insert(TicketChange.__table__), rows)
+    session.info['ticket_changes_written'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_hub(session):
+    if session.info.pop('ticket_changes_written', False) and has_app_context():
+        hub = current_app.extensions.get('change_hub')
+        if hub is not None:
+            hub.wake()  # mesmo processo: entrega sem esperar o próximo ciclo
+
+
+class Subscription:
+    def __init__(self, hub, user_id, ticket_id):
+        self.hub = hub
+        self.user_id = user_id  # None = admin
+        self.ticket_id = ticket_id  # None = listagem
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE)
+        self.overflow = False
+
+    def wants(self, change):
+        if self.ticket_id is not None and change.ticket_id != self.ticket_id:
+            return False
+        return change.visible_to(self.user_id)
+
+    def push(self, change):
+        try:
+            self.queue.put_nowait(change)
+        except queue.Full:
+            self.overflow = True  # cliente lento: recebe 'reset' e recarrega
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class ChangeHub:
+    """Lê `ticket_changes` numa thread e distribui para as assinaturas do processo."""
+
+    def __init__(self, app, interval=1.0, retention=timedelta(hours=1)):
+        self.app = app
+        self.interval = interval
+        self.retention = retention
+        self.last_seq = None
+        self.recent = deque(maxlen=REPLAY_SIZE)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pruned_at = 0.0
+        self._gaps = {}  # seq ausente -> quando foi notado
+
+    def wake(self):
+        self._wake.set()
+
+    def subscribe(self, user_id, ticket_id=None, since=None):
+        """Assina o feed; `since` repassa o que veio depois dele (se ainda estiver em memória).
+
+        Retorna (assinatura, alterações a reenviar) ou (assinatura, None) quando
+        `since` é antigo demais e o cliente precisa recarregar a página.
+        """
+        self._start()
+        sub = Subscription(self, user_id, ticket_id)
+        with self._lock:
+            self._subscribers.add(sub)
+            if since is None or since >= (self.last_seq or 0):
+                return sub, []
+            if not self.recent or self.recent[0].seq > since + 1:
+                return sub, None
+            return sub, [c for c in self.recent if c.seq > since and sub.wants(c)]
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            with self.app.app_context():
+                self.last_seq = last_seq()
+                db.session.remove()
+            self._thread = threading.Thread(target=self._run, name='change-hub', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                try:
+                    while self.poll() == POLL_BATCH:
+                        pass
+                    self._prune()
+                except Exception:
+                    self.app.logger.exception('Falha ao ler o feed de alterações')
+                finally:
+                    db.session.remove()
+
+    def poll(self):
+        """Lê e distribui o próximo lote do feed; retorna quantas linhas leu."""
+        # Seqs são reservados no INSERT mas aparecem no COMMIT: um seq menor pode
+        # surgir depois de um maior. Os buracos são relidos até GAP_TIMEOUT.
+        newer = TicketChange.seq > self.last_seq
+        where = or_(newer, TicketChange.seq.in_(self._gaps)) if self._gaps else newer
+        rows = db.session.execute(select(TicketChange).where(where)
+                                  .order_by(TicketChange.seq).limit(POLL_BATCH)).scalars().all()
+        self._track_gaps(rows)
+        if not rows:
+            return 0
+        ids = {r.ticket_id for r in rows}
+        tickets = {t.id: t for t in Ticket.query.filter(Ticket.id.in_(ids))}
+        interaction_ids = {r.interaction_id for r in rows if r.interaction_id}
+        interactions = {}
+        if interaction_ids:
+            interactions = {i.id: {'id': i.id, 'author': i.author, 'content': i.content, 'created_at': i.created_at}
+                            for i in Interaction.query.filter(Interaction.id.in_(interaction_ids))}
+        changes = []
+        for r in rows:
+            ticket = tickets.get(r.ticket_id)
+            if ticket is None and r.kind != 'delete':
+                continue  # excluído depois, a exclusão vem adiante no feed
+            if r.interaction_id is not None and r.interaction_id not in interactions:
+                continue
+            changes.append(Change(
+                seq=r.seq, ticket_id=r.ticket_id, kind=r.kind,
+                created_by=ticket.created_by if ticket is not None else r.created_by,
+                row=TicketRow.from_ticket(ticket) if ticket is not None else None,
+                interaction=interactions.get(r.interaction_id)))
+        with self._lock:
+            self.last_seq = max(self.last_seq, rows[-1].seq)
+            self.recent.extend(changes)
+            subscribers = list(self._subscribers)
+        for change in changes:
+            for sub in subscribers:
+                if sub.wants(change):
+                    sub.push(change)
+        return len(rows)
+
+    def _track_gaps(self, rows):
+        now = time.monotonic()
+        seen = {r.seq for r in rows}
+        for seq in seen:
+            self._gaps.pop(seq, None)
+        if rows:
+            for seq in range(self.last_seq + 1, rows[-1].seq):
+                if seq not in seen:
+                    self._gaps.setdefault(seq, now)
+        for seq, noticed in list(self._gaps.items()):
+            if now - noticed > GAP_TIMEOUT:
+                del self._gaps[seq]  # transação desfeita: o seq nunca vai aparecer
+
+    def _prune(self):
+        if time.monotonic() - self._pruned_at < PRUNE_EVERY:
+            return
+        self._pruned_at = time.monotonic()
+        cutoff = datetime.utcnow() - self.retention
+        # Mantém sempre a última linha: no MySQL < 8 o AUTO_INCREMENT volta ao máximo+1 ao reiniciar
+        db.session.execute(delete(TicketChange).where(TicketChange.created_at < cutoff,
+                                                      TicketChange.seq < self.last_seq))
+        db.session.commit()
+
+
+def _sse(event_name, data, seq=None):
+    head = f'id: {seq}\n' if seq is not None else ''
+    return f'{head}event: {event_name}\ndata: {json.dumps(data)}\n\n'
+
+
+def _render(change, detail, spec=None):
+    """Evento SSE de uma alteração: a linha da listagem ou, no detalhe, a interação nova.
+
+    `spec` (TicketQuery) é o filtro da listagem aberta: o chamado que saiu dele
+    vira 'delete' e some da página.
+    """
+    if change.kind == 'delete':
+        return _sse('delete', {'id': change.ticket_id}, change.seq)
+    if spec is not None:
+        matches = spec.matches(change.row)
+        db.session.close()  # o stream não segura conexão entre eventos
+        if not matches:
+            return _sse('delete', {'id': change.ticket_id}, change.seq)
+    if detail:
+        if change.interaction is not None:
+            html = render_template('_interactions.html', page=Page(items=[change.interaction]), ticket_id=change.ticket_id)
+            return _sse('interaction', {'id': change.ticket_id, 'html': html}, change.seq)
+        return _sse('ticket', {'id': change.ticket_id}, change.seq)
+    return _sse('row', {'id': change.ticket_id, 'html': ticket_rows([change.row])}, change.seq)
+
+
+def concurrent_server(environ):
+    """Se o servidor atende outras requisições enquanto um stream fica aberto (threads ou gevent)."""
+    if environ.get('wsgi.multithread'):
+        return True
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+def stream(sub, replay, max_seconds=300, heartbeat=15, retry=3, spec=None):
+    """Corpo do `text/event-stream`; encerra após `max_seconds` (o navegador reconecta
+    em `retry` segundos com Last-Event-ID). Com `max_seconds=0` só entrega o que já há.
+    `spec`: filtro (status/busca) da listagem, ver `_render`."""
+    detail = sub.ticket_id is not None
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield f'retry: {int(retry * 1000)}\n\n'
+        if replay is None:
+            yield _sse('reset', {})
+            return
+        for change in replay:
+            yield _render(change, detail, spec)
+        while time.monotonic() < deadline:
+            change = sub.get(timeout=min(heartbeat, max(deadline - time.monotonic(), 0.1)))
+            if sub.overflow:
+                yield _sse('reset', {})
+                return
+            yield _render(change, detail, spec) if change is not None else ': ping\n\n'
+    finally:
+        sub.close()
+
+
+def init_changes(app):
+    app.extensions['change_hub'] = ChangeHub(
+        app,
+        interval=app.config.get('CHANGE_FEED_POLL', 1.0),
+        retention=timedelta(minutes=app.config.get('CHANGE_FEED_RETENTION_MINUTES', 60)),
+    )
+
+
+def get_hub():
+    return current_app.extensions['change_hub']
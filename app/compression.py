@@ -0,0 +1,94 @@
+"""Compressão negociada das respostas dinâmicas (HTML, CSV, JSON).
+
+Um `after_request` comprime com brotli (se o pacote estiver instalado e o
+cliente aceitar) ou gzip as respostas a partir de `COMPRESS_MIN_SIZE` bytes;
+o CSV da exportação, que é gerado aos poucos, é comprimido em fluxo. O SSE
+e o que já vem codificado (arquivos de app/static/dist) passam direto.
+Atrás de um proxy que já comprime, desligue com COMPRESS_ENABLED=0.
+"""
+import gzip
+import zlib
+
+from flask import current_app, request
+
+COMPRESSIBLE = {'text/html', 'text/csv', 'application/json'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # equilíbrio entre taxa e CPU para conteúdo gerado a cada requisição
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' ou None conforme o Accept-Encoding e o que está disponível."""
+    if accept_encodings['br'] and _brotli() is not None:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return _brotli().compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Comprime um corpo gerado aos poucos, liberando cada pedaço para o cliente."""
+    if encoding == 'br':
+        compressor = _brotli().Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: cabeçalho gzip
+        process, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            out = process(chunk) + flush()
+            if out:
+                yield out
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _compress_response(response):
+    config = current_app.config
+    if (not config['COMPRESS_ENABLED'] or request.method == 'HEAD'
+            or response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # O corpo mudou de bytes: o ETag forte vira fraco (If-None-Match compara pela forma fraca)
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.after_request(_compress_response)
@@ -0,0 +1,78 @@
+"""Resumo periódico de chamados sem interação há mais de 24h.
+
+Substitui o email disparado a cada carregamento da listagem: rode
+`flask digest stale` pelo cron (ex.: de hora em hora). Cada usuário recebe
+no máximo um resumo por janela (`--window-hours`), controlado pela tabela
+`stale_digests`.
+"""
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from markupsafe import escape
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import StaleDigest, Ticket, User
+from .outbox import enqueue_email
+
+DEFAULT_WINDOW_HOURS = 24
+
+
+def window_start(now, hours):
+    epoch = datetime(1970, 1, 1)
+    size = timedelta(hours=hours)
+    return epoch + ((now - epoch) // size) * size
+
+
+def pending_stale(window):
+    """Chamados estagnados de usuários comuns ativos que ainda não receberam o resumo da janela (uma consulta).
+
+    Admins ficam de fora, como no email antigo da listagem.
+    """
+    return (db.session.query(Ticket.id, Ticket.title, User.id.label('user_id'), User.email)
+            .join(User, User.id == Ticket.created_by)
+            .outerjoin(StaleDigest, and_(StaleDigest.user_id == User.id, StaleDigest.window_start == window))
+            .filter(Ticket.is_stale_24h, User.role != 'admin', User.is_active.is_(True),
+                    StaleDigest.id.is_(None))
+            .order_by(User.id, Ticket.id)
+            .all())
+
+
+def digest_body(tickets):
+    items = ''.join(f"<li>#{t_id} - {escape(title)}</li>" for t_id, title in tickets)
+    return f"<p>Você possui chamados sem interação há mais de 24h:</p><ul>{items}</ul>"
+
+
+def send_stale_digests(window_hours=DEFAULT_WINDOW_HOURS, now=None):
+    """Enfileira um resumo por usuário; retorna quantos foram enfileirados."""
+    window = window_start(now or datetime.utcnow(), window_hours)
+    per_user = {}
+    for ticket_id, title, user_id, email in pending_stale(window):
+        per_user.setdefault((user_id, email), []).append((ticket_id, title))
+
+    sent = 0
+    for (user_id, email), tickets in per_user.items():
+        try:
+            with db.session.begin_nested():
+                db.session.add(StaleDigest(user_id=user_id, window_start=window))
+                enqueue_email(email, "Chamados sem interação há 24h", digest_body(tickets))
+        except IntegrityError:
+            # Outra execução já registrou este usuário nesta janela
+            continue
+        sent += 1
+    db.session.commit()
+    return sent
+
+
+digest_cli = AppGroup('digest', help='Resumos agendados (cron).')
+
+
+@digest_cli.command('stale')
+@click.option('--window-hours', default=DEFAULT_WINDOW_HOURS, show_default=True,
+              help='Cada usuário recebe no máximo um resumo por janela.')
+def stale_command(window_hours):
+    """Enfileira o resumo de chamados sem interação há +24h."""
+    sent = send_stale_digests(window_hours)
+    click.echo(f'{sent} resumo(s) enfileirado(s)')
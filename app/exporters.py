@@ -0,0 +1,91 @@
+import csv
+from datetime import datetime
+from io import StringIO
+
+from sqlalchemy import func
+
+from .models import Ticket, User
+
+EXPORT_BATCH = 1000
+
+STATUS_LABELS = {
+    'aberto': 'Aberto',
+    'pendente_totvs': 'Pendente TOTVS',
+    'pendente_feso': 'Pendente FESO',
+    'validacao_cliente': 'Validação Cliente',
+    'fechado': 'Fechado',
+}
+
+EXPORT_HEADERS = ['ID', 'Título', 'Status', 'Prioridade', 'Terceirizada', 'Responsável', 'Criado por', 'Aberto há (HH:MM:SS)', 'Criado em', 'Atualizado em', 'Última interação', 'Alerta 24h']
+
+
+def fmt_dt(dt):
+    return dt.strftime('%d/%m/%Y %H:%M') if dt else ''
+
+
+def fmt_td(td):
+    try:
+        total = int(td.total_seconds())
+    except Exception:
+        return ''
+    h, rem = divmod(total, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+def export_rows(query):
+    """Linhas formatadas da exportação, lidas em lotes de um cursor no servidor.
+
+    Seleciona só as colunas necessárias (com o email do criador via JOIN e a
+    última interação desnormalizada em tickets), sem montar objetos Ticket.
+    """
+    rows = (query.join(User, User.id == Ticket.created_by)
+            .with_entities(Ticket.id, Ticket.title, Ticket.status, Ticket.priority, Ticket.vendor,
+                           Ticket.assignee, User.email, Ticket.created_at, Ticket.updated_at,
+                           Ticket.last_contact_at)
+            .order_by(Ticket.updated_at.desc(), Ticket.id.desc())
+            .yield_per(EXPORT_BATCH))
+    now = datetime.utcnow()
+    cutoff = Ticket.stale_cutoff()
+    for r in rows:
+        last_contact = r.last_contact_at or r.created_at
+        stale = r.status != 'fechado' and last_contact is not None and last_contact < cutoff
+        yield [
+            r.id,
+            r.title,
+            STATUS_LABELS.get(r.status, r.status),
+            r.priority,
+            r.vendor or '',
+            r.assignee or '',
+            r.email,
+            fmt_td(now - (r.created_at or now)),
+            fmt_dt(r.created_at),
+            fmt_dt(r.updated_at),
+            fmt_dt(last_contact),
+            'Sim' if stale else 'Não',
+        ]
+
+
+def status_metrics(query):
+    """Quantidade de chamados por status (GROUP BY no banco), ordenada pelo rótulo."""
+    counts = (query.order_by(None)
+              .with_entities(Ticket.status, func.count(Ticket.id))
+              .group_by(Ticket.status)
+              .all())
+    return sorted([STATUS_LABELS.get(s, s), n] for s, n in counts)
+
+
+def iter_csv(rows, batch=EXPORT_BATCH):
+    """Gera o CSV em blocos de `batch` linhas (memória constante)."""
+    buf = StringIO()
+    # BOM para Excel reconhecer UTF-8 e dica para usar ';' como separador
+    buf.write('\ufeffsep=;\n')
+    cw = csv.writer(buf, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+    cw.writerow(EXPORT_HEADERS)
+    for n, row in enumerate(rows, 1):
+        cw.writerow(row)
+        if n % batch == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
@@ -1,16 +1,49 @@
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RoutingSession(Session):
+    """Manda SELECTs para a réplica escolhida em `info['replica']` (app/replicas.py).
+
+    Flush, escritas via Core, SELECT ... FOR UPDATE e `session.connection()`
+    continuam no primário.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if (replica is not None and bind is None and not self._flushing
+                and getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
 
 
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 login_manager.login_view = 'main.login'
 
 
+def init_migrate(app):
+    # Flask-Migrate carrega o alembic inteiro (~150ms); só o CLI (`flask db`) precisa dele
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite só aplica ON DELETE CASCADE com foreign_keys ligado (vale por conexão)
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
 @login_manager.user_loader
 def load_user(user_id):
     # Import local para evitar import circular
-    from .models import User
-    return User.query.get(int(user_id))
+    from .identity import load_identity
+    return load_identity(int(user_id))
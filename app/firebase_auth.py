@@ -0,0 +1,158 @@
+"""Verificação local de ID tokens do Firebase.
+
+Valida a assinatura RS256 contra os certificados públicos do Google, que
+ficam em memória pelo `max-age` do `Cache-Control` e são renovados em
+segundo plano. Tokens já validados ficam num cache curto (pelo hash), então
+o login não faz chamada de rede síncrona no caminho normal.
+
+Usa PyJWT + cryptography (fixados em requirements.txt), importados no
+primeiro login; o firebase-admin não é necessário.
+"""
+import hashlib
+import re
+import threading
+import time
+
+from flask import current_app
+
+from .cache import MemoryCache
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+DEFAULT_MAX_AGE = 3600
+REFRESH_MARGIN = 300  # renovar 5 min antes de expirar
+MIN_REFETCH = 60  # intervalo mínimo entre buscas por kid desconhecido
+VERIFIED_TTL = 300
+CLOCK_SKEW = 60
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class InvalidIdToken(Exception):
+    pass
+
+
+def fetch_google_certs(url=GOOGLE_CERTS_URL, timeout=10):
+    """Retorna ({kid: certificado PEM}, max_age em segundos)."""
+    import requests
+    r = requests.get(url, timeout=timeout)
+    r.raise_for_status()
+    match = _MAX_AGE_RE.search(r.headers.get('Cache-Control', ''))
+    return r.json(), int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+
+class GoogleCertCache:
+    def __init__(self, fetch=fetch_google_certs):
+        self._fetch = fetch
+        self._keys = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def refresh(self):
+        from cryptography.x509 import load_pem_x509_certificate
+        certs, max_age = self._fetch()
+        keys = {kid: load_pem_x509_certificate(pem.encode()).public_key() for kid, pem in certs.items()}
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.time()
+            self._expires_at = self._fetched_at + max_age
+
+    def start(self):
+        """Inicia a renovação em segundo plano (idempotente)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='google-certs', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                wait = max(self._expires_at - time.time() - REFRESH_MARGIN, MIN_REFETCH)
+            except Exception:
+                wait = MIN_REFETCH
+            self._stop.wait(wait)
+
+    def get_key(self, kid):
+        key = self._keys.get(kid)
+        if key is not None:
+            # Expirado: segue usando até a thread trazer os novos certificados
+            if time.time() >= self._expires_at:
+                self.start()
+            return key
+        # kid desconhecido: partida a frio ou rotação de chaves
+        if time.time() - self._fetched_at >= MIN_REFETCH:
+            try:
+                self.refresh()
+            except Exception as exc:
+                raise InvalidIdToken(f'certificados indisponíveis: {exc}') from exc
+        return self._keys.get(kid)
+
+
+class FirebaseTokenVerifier:
+    def __init__(self, project_id, certs=None, verified_ttl=VERIFIED_TTL, max_entries=1024):
+        self.project_id = project_id
+        self.issuer = f'https://securetoken.google.com/{project_id}'
+        self.certs = certs or GoogleCertCache()
+        self.verified_ttl = verified_ttl
+        self._verified = MemoryCache(max_entries)
+
+    def verify(self, id_token):
+        """Retorna as claims do token ou levanta InvalidIdToken."""
+        import jwt
+
+        token_hash = hashlib.sha256(id_token.encode()).hexdigest()
+        claims = self._verified.get(token_hash)
+        if claims is not None:
+            if claims['exp'] > time.time():
+                return claims
+            self._verified.delete(token_hash)
+
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.PyJWTError as exc:
+            raise InvalidIdToken(str(exc)) from exc
+        if header.get('alg') != 'RS256' or not header.get('kid'):
+            raise InvalidIdToken('cabeçalho inválido')
+        key = self.certs.get_key(header['kid'])
+        if key is None:
+            raise InvalidIdToken('kid desconhecido')
+        try:
+            claims = jwt.decode(
+                id_token, key, algorithms=['RS256'], audience=self.project_id, issuer=self.issuer,
+                leeway=CLOCK_SKEW, options={'require': ['exp', 'iat', 'sub', 'aud', 'iss']},
+            )
+        except jwt.PyJWTError as exc:
+            raise InvalidIdToken(str(exc)) from exc
+        if not claims.get('sub') or claims.get('auth_time', 0) > time.time() + CLOCK_SKEW:
+            raise InvalidIdToken('claims inválidas')
+
+        ttl = min(self.verified_ttl, claims['exp'] - time.time())
+        if ttl > 0:
+            self._verified.set(token_hash, claims, ttl)
+        return claims
+
+
+_lock = threading.Lock()
+
+
+def get_token_verifier():
+    """Verificador do app (criado no primeiro uso), ou None sem FIREBASE_PROJECT_ID."""
+    verifier = current_app.extensions.get('firebase_verifier')
+    if verifier is None:
+        project_id = current_app.config.get('FIREBASE_PROJECT_ID')
+        if not project_id:
+            return None
+        with _lock:
+            verifier = current_app.extensions.get('firebase_verifier')
+            if verifier is None:
+                verifier = FirebaseTokenVerifier(project_id)
+                verifier.certs.start()
+                current_app.extensions['firebase_verifier'] = verifier
+    return verifier
@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField
 from wtforms import StringField, PasswordField, TextAreaField, SelectField, SubmitField, BooleanField
 from wtforms.fields import DateTimeLocalField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, Regexp
@@ -32,24 +33,50 @@ class ResetPasswordForm(FlaskForm):
     submit = SubmitField('Redefinir Senha')
 
 
+STATUS_CHOICES = [
+    ('aberto','Aberto'),
+    ('pendente_totvs','Pendente TOTVS'),
+    ('pendente_feso','Pendente FESO'),
+    ('validacao_cliente','Validação Cliente'),
+    ('fechado','Fechado')
+]
+PRIORITY_CHOICES = [('baixa','Baixa'),('media','Média'),('alta','Alta'),('critica','Crítica')]
+
+
 class TicketForm(FlaskForm):
     title = StringField('Título', validators=[DataRequired(), Length(max=200)])
     description = TextAreaField('Descrição')
-    status = SelectField('Status', choices=[
-        ('aberto','Aberto'),
-        ('pendente_totvs','Pendente TOTVS'),
-        ('pendente_feso','Pendente FESO'),
-        ('validacao_cliente','Validação Cliente'),
-        ('fechado','Fechado')
-    ])
-    priority = SelectField('Prioridade', choices=[('baixa','Baixa'),('media','Média'),('alta','Alta'),('critica','Crítica')])
+    status = SelectField('Status', choices=STATUS_CHOICES)
+    priority = SelectField('Prioridade', choices=PRIORITY_CHOICES)
     vendor = StringField('Terceirizada', validators=[Length(max=120)])
     assignee = StringField('Responsável', validators=[Length(max=120)])
     submit = SubmitField('Salvar')
 
 
+class BulkTicketForm(FlaskForm):
+    # os ids vêm dos checkboxes da listagem (request.form.getlist('ids'))
+    action = SelectField('Ação', choices=[
+        ('status','Alterar status'),
+        ('priority','Alterar prioridade'),
+        ('vendor','Alterar terceirizada'),
+        ('assignee','Alterar responsável'),
+        ('delete','Excluir')
+    ])
+    status = SelectField('Status', choices=STATUS_CHOICES)
+    priority = SelectField('Prioridade', choices=PRIORITY_CHOICES)
+    vendor = StringField('Terceirizada', validators=[Length(max=120)])
+    assignee = StringField('Responsável', validators=[Length(max=120)])
+    submit = SubmitField('Aplicar')
+
+
 class InteractionForm(FlaskForm):
     content = TextAreaField('Conteúdo', validators=[DataRequired()])
     author = StringField('Autor', validators=[DataRequired(), Length(max=120)])
     created_at = DateTimeLocalField('Data', format='%Y-%m-%dT%H:%M', default=datetime.utcnow, validators=[DataRequired()])
     submit = SubmitField('Adicionar')
+
+
+class ImportForm(FlaskForm):
+    tickets = FileField('Chamados (CSV ou XLSX)', validators=[FileAllowed(['csv', 'xlsx'], 'Envie CSV ou XLSX')])
+    interactions = FileField('Interações (opcional)', validators=[FileAllowed(['csv', 'xlsx'], 'Envie CSV ou XLSX')])
+    submit = SubmitField('Importar')
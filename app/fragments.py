@@ -0,0 +1,96 @@
+"""Cache das linhas renderizadas da listagem (`_ticket_row.html`).
+
+Uma linha só muda quando o chamado é alterado (updated_at), recebe contato
+(last_contact_at, o marcador da última interação) ou passa a "sem interação
+há 24h"; fora isso o HTML é reaproveitado entre requisições e usuários.
+"Aberto há" muda a cada segundo: a linha é guardada em duas partes e o tempo
+é formatado entre elas a cada uso. LRU por processo limitado em entradas
+(`ROW_CACHE_MAX_ENTRIES`) e bytes (`ROW_CACHE_MAX_BYTES`).
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app, request
+from markupsafe import Markup
+
+ROW_TEMPLATE = '_ticket_row.html'
+AGE_SLOT = '\x00age\x00'  # marcador trocado pelo "Aberto há" de cada requisição
+
+
+class RowCache:
+    def __init__(self, max_entries=5000, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # (id, raiz do app) -> (TicketRow, atrasado, antes, depois)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, row, stale):
+        with self._lock:
+            entry = self._data.get(key)
+            # Compara a linha inteira: DATETIME do MySQL tem resolução de segundos,
+            # então duas edições no mesmo segundo teriam o mesmo updated_at
+            if entry is None or entry[0] != row or entry[1] != stale:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2], entry[3]
+
+    def set(self, key, row, stale, parts):
+        size = len(parts[0]) + len(parts[1])
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[2]) + len(old[3])
+            self._data[key] = (row, stale, *parts)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted[2]) + len(evicted[3])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'bytes': self._bytes}
+
+
+def _render_parts(row, stale):
+    html = current_app.jinja_env.get_template(ROW_TEMPLATE).render(t=row, stale=stale, age=AGE_SLOT)
+    before, _, after = html.partition(AGE_SLOT)
+    return before, after
+
+
+def ticket_rows(rows, now=None):
+    """HTML das linhas de `rows` (TicketRow), do cache quando o chamado não mudou."""
+    cache = get_row_cache()
+    now = now or datetime.utcnow()
+    format_age = current_app.jinja_env.filters['format_timedelta']
+    out = []
+    for row in rows:
+        stale = row.is_stale_24h
+        key = (row.id, request.script_root)
+        parts = cache.get(key, row, stale)
+        if parts is None:
+            parts = _render_parts(row, stale)
+            cache.set(key, row, stale, parts)
+        out.append(parts[0] + format_age(now - row.created_at) + parts[1])
+    return Markup(''.join(out))
+
+
+def init_fragments(app):
+    app.extensions['row_cache'] = RowCache(
+        max_entries=app.config.get('ROW_CACHE_MAX_ENTRIES', 5000),
+        max_bytes=app.config.get('ROW_CACHE_MAX_BYTES', 8 * 1024 * 1024),
+    )
+    app.jinja_env.globals['ticket_rows'] = ticket_rows
+
+
+def get_row_cache():
+    return current_app.extensions['row_cache']
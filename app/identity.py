@@ -0,0 +1,116 @@
+"""Cache de identidade para o user_loader do Flask-Login.
+
+Guarda cópias leves dos usuários (sem hash de senha) por alguns segundos,
+evitando o SELECT em `users` a cada requisição autenticada. Cada cópia
+guarda a versão do usuário no cache compartilhado (`RESULT_CACHE_URL`), que
+é incrementada no commit de qualquer alteração em `User`: os demais workers
+veem a versão nova na próxima requisição e releem o usuário (desativação ou
+troca de papel valem na hora). Com `memory://` ou `null://` a versão não é
+compartilhada e nos outros workers a cópia expira pelo TTL (`IDENTITY_CACHE_TTL`).
+"""
+import threading
+from dataclasses import dataclass
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from .cache import MemoryCache, NullCache
+from .extensions import db
+from .models import User
+
+
+@dataclass(frozen=True)
+class UserSnapshot(UserMixin):
+    id: int
+    name: str
+    email: str
+    role: str
+    active: bool
+    phone_e164: str | None
+
+    @property
+    def is_active(self):
+        return self.active
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.name, user.email, user.role or 'user', bool(user.is_active), user.phone_e164)
+
+
+def _scope(user_id):
+    return f'identity:{user_id}'
+
+
+class IdentityCache:
+    def __init__(self, ttl=60, max_entries=4096, shared=None):
+        self.ttl = ttl
+        self.shared = shared or NullCache()  # onde fica a versão de cada usuário
+        self._cache = MemoryCache(max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0  # consultas ao banco evitadas
+        self.misses = 0
+
+    def load(self, user_id):
+        # Versão lida antes do banco: uma alteração concorrente deixa a cópia já desatualizada
+        version = self.shared.version(_scope(user_id))
+        entry = self._cache.get(user_id)
+        if entry is not None and entry[0] == version:
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+        with self._lock:
+            self.misses += 1
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snap = UserSnapshot.from_user(user)
+        self._cache.set(user_id, (version, snap), self.ttl)
+        return snap
+
+    def invalidate(self, user_id):
+        self._cache.delete(user_id)
+        self.shared.bump(_scope(user_id))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache)}
+
+
+def init_identity_cache(app):
+    app.extensions['identity_cache'] = IdentityCache(
+        ttl=app.config.get('IDENTITY_CACHE_TTL', 60),
+        max_entries=app.config.get('IDENTITY_CACHE_MAX_ENTRIES', 4096),
+        shared=app.extensions.get('result_cache'),
+    )
+
+
+def get_identity_cache():
+    return current_app.extensions['identity_cache']
+
+
+def load_identity(user_id):
+    return get_identity_cache().load(user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _collect_user(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('identity_invalidate', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_users(session):
+    # Só após o commit: antes dele outro worker releria o usuário antigo com a versão nova
+    ids = session.info.pop('identity_invalidate', None)
+    cache = current_app.extensions.get('identity_cache') if has_app_context() else None
+    if ids and cache is not None:
+        for user_id in ids:
+            cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_users(session):
+    session.info.pop('identity_invalidate', None)
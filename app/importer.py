@@ -0,0 +1,474 @@
+"""Importação em massa de chamados e interações (CSV ou XLSX).
+
+Chamados usam o formato da exportação (`;`, BOM e linha `sep=;` opcionais),
+com as colunas identificadas pelo cabeçalho; as derivadas (Aberto há, Última
+interação, Alerta 24h) são ignoradas e `Descrição` é aceita a mais.
+Interações: Chamado (o ID da planilha de chamados importada junto ou, sem
+ela, o id de um chamado existente), Autor, Conteúdo e Data. No XLSX, as
+planilhas `Chamados` e `Interações`.
+
+Cada linha é validada com as regras de TicketForm/InteractionForm
+(obrigatórios, tamanhos e opções) e as válidas são inseridas por Core
+executemany, um lote por transação. Um erro de banco descarta só o seu
+lote; o relatório lista linhas rejeitadas e lotes com falha. Cada lote
+atualiza na mesma transação o último contato, o índice de busca e
+ticket_stats.
+"""
+import csv
+import io
+import time
+import unicodedata
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from wtforms.fields.core import UnboundField
+from wtforms.validators import DataRequired, Length
+
+from .changes import record
+from .extensions import db
+from .forms import InteractionForm, TicketForm
+from .models import Interaction, Ticket, User, refresh_contact_columns
+from .queries import invalidate_tickets
+from .search import get_backend
+from .stats import apply_deltas, row_deltas
+from .vendors import VendorResolver
+from .xlsx import XlsxReader
+
+IMPORT_BATCH = 2000
+MAX_REPORTED_ERRORS = 500
+TICKETS_SHEET = 'Chamados'
+INTERACTIONS_SHEET = 'Interações'
+
+TICKET_COLUMNS = {
+    'id': ('id',),
+    'title': ('titulo', 'title'),
+    'description': ('descricao', 'description'),
+    'status': ('status',),
+    'priority': ('prioridade', 'priority'),
+    'vendor': ('terceirizada', 'vendor'),
+    'assignee': ('responsavel', 'assignee'),
+    'creator': ('criado por', 'created_by', 'email'),
+    'created_at': ('criado em', 'created_at'),
+    'updated_at': ('atualizado em', 'updated_at'),
+}
+INTERACTION_COLUMNS = {
+    'ticket': ('chamado', 'id do chamado', 'ticket_id', 'ticket'),
+    'author': ('autor', 'author'),
+    'content': ('conteudo', 'content'),
+    'created_at': ('data', 'criado em', 'created_at'),
+}
+DATETIME_FORMATS = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M')
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+def _norm(text):
+    """'Pendente TOTVS' e 'pendente_totvs' -> 'pendente totvs' (sem acentos)."""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.replace('_', ' ').lower().split())
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    required: bool = False
+    max_length: int | None = None
+    choices: dict | None = None  # forma normalizada (valor ou rótulo) -> valor
+
+
+def form_rules(form_cls):
+    """Regras dos campos de um FlaskForm, aplicadas sem instanciar o form a cada linha."""
+    rules = {}
+    for name in dir(form_cls):
+        unbound = getattr(form_cls, name)
+        if not isinstance(unbound, UnboundField):
+            continue
+        validators = unbound.kwargs.get('validators') or ()
+        max_length = next((v.max for v in validators if isinstance(v, Length) and v.max != -1), None)
+        choices = None
+        if 'choices' in unbound.kwargs:
+            choices = {}
+            for value, label in unbound.kwargs['choices']:
+                choices[_norm(value)] = value
+                choices[_norm(label)] = value
+        rules[name] = FieldRule(any(isinstance(v, DataRequired) for v in validators), max_length, choices)
+    return rules
+
+
+TICKET_RULES = form_rules(TicketForm)
+INTERACTION_RULES = form_rules(InteractionForm)
+
+
+def _clean(rules, name, value, label, errors):
+    rule = rules[name]
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = '' if value is None else str(value).strip()
+    if not value:
+        if rule.required:
+            errors.append(f'{label} obrigatório')
+        return None
+    if rule.max_length and len(value) > rule.max_length:
+        errors.append(f'{label} excede {rule.max_length} caracteres')
+        return None
+    if rule.choices is not None:
+        choice = rule.choices.get(_norm(value))
+        if choice is None:
+            errors.append(f'{label} inválido: {value}')
+        return choice
+    return value
+
+
+def parse_datetime(value):
+    """Aceita dd/mm/aaaa [hh:mm[:ss]], ISO 8601 e número serial do Excel; None se vazio."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return EXCEL_EPOCH + timedelta(days=value)
+    text = str(value).strip()
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(text)
+
+
+def _date(value, label, errors, required=False):
+    try:
+        dt = parse_datetime(value)
+    except (ValueError, OverflowError):
+        errors.append(f'{label} inválida: {value}')
+        return None
+    if dt is None and required:
+        errors.append(f'{label} obrigatória')
+    return dt
+
+
+def _ref(value):
+    """ID de chamado como texto estável ('12', 12 e 12.0 são o mesmo)."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value not in (None, '') else None
+
+
+# Leitura ------------------------------------------------------------------
+
+def iter_csv_rows(fh):
+    """(linha, valores) de um CSV binário no formato da exportação."""
+    text = io.TextIOWrapper(fh, encoding='utf-8-sig', newline='')
+    first = text.readline()
+    delimiter, line = ';', 1
+    if first.lower().startswith('sep='):
+        delimiter = first[4:5] or ';'
+        first, line = text.readline(), 2
+    if not first:
+        return
+    yield line, next(csv.reader([first], delimiter=delimiter))
+    reader = csv.reader(text, delimiter=delimiter)
+    for values in reader:
+        yield line + reader.line_num, values
+
+
+def iter_xlsx_rows(reader, sheet):
+    for line, values in enumerate(reader.rows(sheet), 1):
+        yield line, values
+
+
+class Table:
+    """Linhas de uma planilha como dicts pelos nomes internos das colunas."""
+
+    def __init__(self, name, rows, columns):
+        self.name = name
+        self._rows = iter(rows)
+        try:
+            _, header = next(self._rows)
+        except StopIteration:
+            header = []
+        aliases = {alias: key for key, names in columns.items() for alias in names}
+        self.positions = {}
+        for idx, title in enumerate(header):
+            key = aliases.get(_norm(title or ''))
+            if key and key not in self.positions:
+                self.positions[key] = idx
+
+    def __iter__(self):
+        for line, values in self._rows:
+            if not any(v not in (None, '') for v in values):
+                continue
+            yield line, {key: values[idx] if idx < len(values) else None for key, idx in self.positions.items()}
+
+
+def open_tables(fileobj, filename):
+    """Retorna (chamados, interações) de um arquivo; no CSV, só a primeira."""
+    if filename.lower().endswith('.xlsx'):
+        reader = XlsxReader(fileobj)
+        names = list(reader.sheets)
+        tickets_sheet = TICKETS_SHEET if TICKETS_SHEET in reader.sheets else names[0]
+        tickets = Table(tickets_sheet, iter_xlsx_rows(reader, tickets_sheet), TICKET_COLUMNS)
+        interactions = None
+        if INTERACTIONS_SHEET in reader.sheets:
+            interactions = Table(INTERACTIONS_SHEET, iter_xlsx_rows(reader, INTERACTIONS_SHEET), INTERACTION_COLUMNS)
+        return tickets, interactions
+    return Table(filename, iter_csv_rows(fileobj), TICKET_COLUMNS), None
+
+
+def open_interactions(fileobj, filename):
+    if filename.lower().endswith('.xlsx'):
+        reader = XlsxReader(fileobj)
+        sheet = INTERACTIONS_SHEET if INTERACTIONS_SHEET in reader.sheets else next(iter(reader.sheets))
+        return Table(sheet, iter_xlsx_rows(reader, sheet), INTERACTION_COLUMNS)
+    return Table(filename, iter_csv_rows(fileobj), INTERACTION_COLUMNS)
+
+
+# Importação ---------------------------------------------------------------
+
+@dataclass
+class ImportReport:
+    tickets: int = 0
+    interactions: int = 0
+    rejected: int = 0
+    failed_batches: int = 0
+    errors: list = field(default_factory=list)  # (planilha, linha ou faixa, mensagem)
+    creators: set = field(default_factory=set)
+    seconds: float = 0.0
+
+    def error(self, sheet, where, message):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((sheet, where, message))
+
+    def summary(self):
+        return (f'{self.tickets} chamado(s) e {self.interactions} interação(ões) importados em {self.seconds:.1f}s; '
+                f'{self.rejected} linha(s) rejeitada(s), {self.failed_batches} lote(s) com falha')
+
+
+def _ticket_row(values, users, default_user_id, now, errors):
+    row = {
+        'title': _clean(TICKET_RULES, 'title', values.get('title'), 'Título', errors),
+        'description': _clean(TICKET_RULES, 'description', values.get('description'), 'Descrição', errors),
+        'status': _clean(TICKET_RULES, 'status', values.get('status'), 'Status', errors) or 'aberto',
+        'priority': _clean(TICKET_RULES, 'priority', values.get('priority'), 'Prioridade', errors) or 'media',
+        'vendor': _clean(TICKET_RULES, 'vendor', values.get('vendor'), 'Terceirizada', errors),
+        'assignee': _clean(TICKET_RULES, 'assignee', values.get('assignee'), 'Responsável', errors),
+    }
+    creator = str(values.get('creator') or '').strip().lower()
+    row['created_by'] = users.get(creator, default_user_id)
+    created_at = _date(values.get('created_at'), 'Criado em', errors) or now
+    row['created_at'] = created_at
+    row['updated_at'] = _date(values.get('updated_at'), 'Atualizado em', errors) or created_at
+    row['last_contact_at'] = created_at  # recalculado quando houver interações
+    return row
+
+
+def _insert_tickets(connection, rows):
+    """Insere e retorna os ids na ordem das linhas."""
+    table = Ticket.__table__
+    if connection.dialect.insert_executemany_returning_sort_by_parameter_order:
+        stmt = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+        return [r[0] for r in connection.execute(stmt, rows)]
+    if connection.dialect.name == 'mysql':
+        # MySQL não tem RETURNING. Com innodb_autoinc_lock_mode 0/1 um INSERT de várias
+        # linhas recebe ids consecutivos a partir de LAST_INSERT_ID(), mesmo com inserções
+        # concorrentes do site
+        if connection.exec_driver_sql('SELECT @@innodb_autoinc_lock_mode').scalar() != 2:
+            result = connection.execute(table.insert().values(rows))
+            if result.rowcount != len(rows):
+                raise SQLAlchemyError(f'INSERT gravou {result.rowcount} de {len(rows)} linhas')
+            return list(range(result.lastrowid, result.lastrowid + len(rows)))
+        # No modo 2 (padrão do MySQL 8) os ids podem intercalar com os de outras
+        # inserções: cada linha leva uma chave do lote e os ids são relidos por ela
+        batch = uuid.uuid4().hex
+        keys = [f'{batch}:{n}' for n in range(len(rows))]
+        connection.execute(table.insert(), [dict(row, import_key=k) for row, k in zip(rows, keys)])
+        ids = dict(connection.execute(
+            select(table.c.import_key, table.c.id).where(table.c.import_key.like(f'{batch}:%'))).all())
+        if len(ids) != len(rows):
+            raise SQLAlchemyError(f'INSERT gravou {len(ids)} de {len(rows)} linhas')
+        return [ids[k] for k in keys]
+    current_app.logger.warning('Importação: %s não devolve os ids de um INSERT em lote; '
+                               'inserindo %d chamados um a um', connection.dialect.name, len(rows))
+    return [connection.execute(table.insert().values(row)).inserted_primary_key[0] for row in rows]
+
+
+class Importer:
+    def __init__(self, default_user_id, batch=IMPORT_BATCH):
+        self.default_user_id = default_user_id
+        self.batch = batch
+        self.engine = db.engine
+        # Antes de abrir transações: no SQLite a inspeção usa outra conexão
+        self.search = get_backend(self.engine)
+        self.users = {email.lower(): uid for uid, email in db.session.execute(select(User.id, User.email))}
+        db.session.rollback()
+        self.report = ImportReport()
+        self.id_map = None  # ID da planilha -> id criado; None = interações apontam para ids existentes
+
+    def _run_batch(self, sheet, pending, work):
+        first, last = pending[0][0], pending[-1][0]
+        try:
+            with self.engine.begin() as connection:
+                return work(connection)
+        except SQLAlchemyError as exc:
+            self.report.failed_batches += 1
+            self.report.error(sheet, f'{first}-{last}', f'lote descartado: {getattr(exc, "orig", exc)}')
+            return None
+
+    def import_tickets(self, table):
+        self.id_map = {}
+        now = datetime.utcnow()
+        pending = []
+        for line, values in table:
+            errors = []
+            row = _ticket_row(values, self.users, self.default_user_id, now, errors)
+            if errors:
+                self.report.rejected += 1
+                self.report.error(table.name, line, '; '.join(errors))
+                continue
+            pending.append((line, _ref(values.get('id')), row))
+            if len(pending) >= self.batch:
+                self._flush_tickets(table.name, pending)
+                pending = []
+        if pending:
+            self._flush_tickets(table.name, pending)
+
+    def _flush_tickets(self, sheet, pending):
+        rows = [row for _, _, row in pending]
+
+        def work(connection):
+            vendors = VendorResolver(connection)
+            for row in rows:
+                row['vendor_id'] = vendors.ensure(row['vendor'])
+            ids = _insert_tickets(connection, rows)
+            record(connection, [(i, row['created_by'], 'ticket') for i, row in zip(ids, rows)])
+            self.search.reindex(connection, ids)
+            apply_deltas(connection, row_deltas(rows))
+            return ids
+
+        ids = self._run_batch(sheet, pending, work)
+        if ids is None:
+            return
+        for (_, ref, _), new_id in zip(pending, ids):
+            if ref is not None:
+                self.id_map[ref] = new_id
+        self.report.tickets += len(ids)
+        self.report.creators.update(row['created_by'] for row in rows)
+
+    def import_interactions(self, table):
+        pending = []
+        for line, values in table:
+            errors = []
+            ref = _ref(values.get('ticket'))
+            row = {
+                'ticket_id': ref,
+                'author': _clean(INTERACTION_RULES, 'author', values.get('author'), 'Autor', errors),
+                'content': _clean(INTERACTION_RULES, 'content', values.get('content'), 'Conteúdo', errors),
+                'created_at': _date(values.get('created_at'), 'Data', errors, required=True),
+            }
+            if ref is None:
+                errors.append('Chamado obrigatório')
+            elif self.id_map is not None:
+                row['ticket_id'] = self.id_map.get(ref)
+                if row['ticket_id'] is None:
+                    errors.append(f'Chamado {ref} não importado')
+            elif not ref.isdigit():
+                errors.append(f'Chamado inválido: {ref}')
+            else:
+                row['ticket_id'] = int(ref)
+            if errors:
+                self.report.rejected += 1
+                self.report.error(table.name, line, '; '.join(errors))
+                continue
+            pending.append((line, row))
+            if len(pending) >= self.batch:
+                self._flush_interactions(table.name, pending)
+                pending = []
+        if pending:
+            self._flush_interactions(table.name, pending)
+
+    def _flush_interactions(self, sheet, pending):
+        if self.id_map is None:
+            # Ids de chamados existentes: conferir numa consulta por lote
+            wanted = {row['ticket_id'] for _, row in pending}
+            found = dict(db.session.execute(
+                select(Ticket.id, Ticket.created_by).where(Ticket.id.in_(wanted))).all())
+            db.session.rollback()  # não segurar a transação de leitura durante as escritas
+            kept = []
+            for line, row in pending:
+                if row['ticket_id'] in found:
+                    kept.append((line, row))
+                else:
+                    self.report.rejected += 1
+                    self.report.error(sheet, line, f"Chamado {row['ticket_id']} não existe")
+            self.report.creators.update(found.values())
+            pending = kept
+            if not pending:
+                return
+        rows = [row for _, row in pending]
+
+        def work(connection):
+            vendors = VendorResolver(connection)
+            for row in rows:
+                row['vendor_id'] = vendors.match(row['author'])
+            connection.execute(Interaction.__table__.insert(), rows)
+            ticket_ids = {row['ticket_id'] for row in rows}
+            record(connection, [(i, None, 'interaction') for i in ticket_ids])
+            refresh_contact_columns(connection, ticket_ids)
+            self.search.reindex(connection, ticket_ids)
+            return len(rows)
+
+        inserted = self._run_batch(sheet, pending, work)
+        if inserted:
+            self.report.interactions += inserted
+
+
+def import_tables(tickets=None, interactions=None, default_user_id=None, batch=IMPORT_BATCH):
+    """Importa as tabelas (de open_tables/open_interactions) e retorna o ImportReport."""
+    started = time.perf_counter()
+    importer = Importer(default_user_id, batch)
+    if tickets is not None:
+        importer.import_tickets(tickets)
+    if interactions is not None:
+        importer.import_interactions(interactions)
+    report = importer.report
+    if report.tickets or report.interactions:
+        invalidate_tickets(*report.creators)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+@click.command('import')
+@click.argument('tickets_file', type=click.Path(exists=True, dir_okay=False), required=False)
+@click.option('--interactions', 'interactions_file', type=click.Path(exists=True, dir_okay=False),
+              help='CSV/XLSX de interações (no XLSX de chamados, a planilha "Interações" é lida sozinha).')
+@click.option('--default-user', required=True, help='Email do criador para linhas sem "Criado por" conhecido.')
+@click.option('--batch', default=IMPORT_BATCH, show_default=True, help='Linhas por transação.')
+@with_appcontext
+def import_command(tickets_file, interactions_file, default_user, batch):
+    """Importa chamados e interações de CSV (formato da exportação) ou XLSX."""
+    user_id = db.session.scalar(select(User.id).where(func.lower(User.email) == default_user.lower()))
+    if user_id is None:
+        raise click.ClickException(f'Usuário {default_user} não encontrado')
+    if not tickets_file and not interactions_file:
+        raise click.UsageError('Informe o arquivo de chamados e/ou --interactions')
+    files = []
+    try:
+        tickets = interactions = None
+        if tickets_file:
+            files.append(open(tickets_file, 'rb'))
+            tickets, interactions = open_tables(files[-1], tickets_file)
+        if interactions_file:
+            files.append(open(interactions_file, 'rb'))
+            interactions = open_interactions(files[-1], interactions_file)
+        report = import_tables(tickets, interactions, user_id, batch)
+    finally:
+        for fh in files:
+            fh.close()
+    for sheet, where, message in report.errors:
+        click.echo(f'{sheet}:{where}: {message}', err=True)
+    click.echo(report.summary())
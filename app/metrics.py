@@ -0,0 +1,233 @@
+"""Instrumentação por requisição exposta em `/metrics` (formato texto do Prometheus).
+
+Cada requisição abre um rastro (contextvar) que acumula o que acontece nela:
+comandos SQL (eventos do Engine, contagem e tempo por comando) e chamadas
+HTTP dos provedores de notificação (app/notify.py). Ao final viram
+histogramas por endpoint. Requisições acima de `METRICS_SLOW_MS` são
+registradas no log com os comandos mais caros, e um mesmo comando repetido
+mais de `METRICS_N_PLUS_ONE` vezes numa requisição é sinalizado como N+1.
+
+Os valores são por processo: com vários workers, o Prometheus deve coletar
+cada um (ou somar via agregação).
+"""
+import bisect
+import hmac
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+DEFAULT_SLOW_MS = 500
+DEFAULT_N_PLUS_ONE = 10
+SLOW_LOG_STATEMENTS = 5
+
+_trace = ContextVar('request_trace', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # valores dos labels -> [contagens por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, series in items:
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value:g}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Duração das requisições.',
+                            ('endpoint', 'method', 'status'))
+REQUEST_DB_SECONDS = Histogram('http_request_db_seconds', 'Tempo em SQL por requisição.', ('endpoint',))
+REQUEST_DB_STATEMENTS = Histogram('http_request_db_statements', 'Comandos SQL por requisição.',
+                                  ('endpoint',), COUNT_BUCKETS)
+REQUEST_HTTP_SECONDS = Histogram('http_request_outbound_seconds', 'Tempo em HTTP externo por requisição.',
+                                 ('endpoint',))
+NOTIFY_SECONDS = Histogram('notify_http_duration_seconds', 'Chamadas HTTP aos provedores de notificação.',
+                           ('provider', 'outcome'))
+SLOW_REQUESTS = CounterMetric('http_slow_requests_total', 'Requisições acima de METRICS_SLOW_MS.', ('endpoint',))
+N_PLUS_ONE = CounterMetric('db_repeated_statements_total',
+                           'Requisições com o mesmo comando SQL repetido além de METRICS_N_PLUS_ONE.',
+                           ('endpoint',))
+REGISTRY = (REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_DB_STATEMENTS, REQUEST_HTTP_SECONDS,
+            NOTIFY_SECONDS, SLOW_REQUESTS, N_PLUS_ONE)
+
+
+class RequestTrace:
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'statements', 'http_seconds', 'http_calls')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = defaultdict(lambda: [0, 0.0])  # comando -> [vezes, segundos]
+        self.http_seconds = 0.0
+        self.http_calls = Counter()
+
+    def top_statements(self, n=SLOW_LOG_STATEMENTS):
+        return sorted(self.statements.items(), key=lambda kv: kv[1][1], reverse=True)[:n]
+
+
+def current_trace():
+    return _trace.get()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _trace.get() is not None:
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace.get()
+    stack = conn.info.get('metrics_started')
+    if trace is None or not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    trace.sql_count += 1
+    trace.sql_seconds += elapsed
+    entry = trace.statements[statement]
+    entry[0] += 1
+    entry[1] += elapsed
+
+
+def record_http(provider, seconds, ok):
+    """Chamado pelo Notifier a cada POST (dentro ou fora de requisições)."""
+    NOTIFY_SECONDS.observe(seconds, provider, 'ok' if ok else 'error')
+    trace = _trace.get()
+    if trace is not None:
+        trace.http_seconds += seconds
+        trace.http_calls[provider] += 1
+
+
+def _start_trace():
+    g.metrics_token = _trace.set(RequestTrace())
+
+
+def _finish_trace(response):
+    trace = _trace.get()
+    if trace is None:
+        return response
+    elapsed = time.perf_counter() - trace.started
+    endpoint = request.endpoint or 'not_found'
+    REQUEST_SECONDS.observe(elapsed, endpoint, request.method, str(response.status_code))
+    REQUEST_DB_SECONDS.observe(trace.sql_seconds, endpoint)
+    REQUEST_DB_STATEMENTS.observe(trace.sql_count, endpoint)
+    if trace.http_calls:
+        REQUEST_HTTP_SECONDS.observe(trace.http_seconds, endpoint)
+
+    config = current_app.config
+    repeated = [(stmt, n) for stmt, (n, _) in trace.statements.items() if n > config['METRICS_N_PLUS_ONE']]
+    if repeated:
+        N_PLUS_ONE.inc(endpoint)
+        for stmt, n in repeated:
+            current_app.logger.warning('N+1 em %s: comando repetido %d vezes: %s', endpoint, n, _oneline(stmt))
+    slow_ms = config['METRICS_SLOW_MS']
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        SLOW_REQUESTS.inc(endpoint)
+        top = '\n'.join(f'  {n}x {secs * 1000:.1f}ms {_oneline(stmt)}' for stmt, (n, secs) in trace.top_statements())
+        current_app.logger.warning(
+            'Requisição lenta %s %s (%s): %.0fms, %d SQL em %.0fms, HTTP %.0fms\n%s',
+            request.method, request.path, endpoint, elapsed * 1000,
+            trace.sql_count, trace.sql_seconds * 1000, trace.http_seconds * 1000, top)
+    return response
+
+
+def _reset_trace(exc=None):
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        _trace.reset(token)
+
+
+def _oneline(statement, limit=300):
+    text = ' '.join(statement.split())
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def init_metrics(app):
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_TOKEN', None)
+    app.config.setdefault('METRICS_SLOW_MS', DEFAULT_SLOW_MS)
+    app.config.setdefault('METRICS_N_PLUS_ONE', DEFAULT_N_PLUS_ONE)
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(_start_trace)
+    app.after_request(_finish_trace)
+    app.teardown_request(_reset_trace)
+
+
+def render_metrics(extra=()):
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_token_ok():
+    """Bearer token de `METRICS_TOKEN` (para o Prometheus, sem sessão)."""
+    expected = current_app.config.get('METRICS_TOKEN')
+    header = request.headers.get('Authorization', '')
+    if not expected or not header.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(header[len('Bearer '):].encode(), expected.encode())
@@ -1,9 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_login import UserMixin
+from sqlalchemy import event, inspect, select, update, func, and_
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session
 from werkzeug.security import generate_password_hash, check_password_hash
 from .extensions import db
 
 
+STALE_HOURS = 24
+
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -26,50 +32,210 @@ class User(UserMixin, db.Model):
 
 class Ticket(db.Model):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # Paginação por cursor em (updated_at, id), sem filtro ou por criador/status
+        db.Index('ix_tickets_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_tickets_created_by_updated_at_id', 'created_by', 'updated_at', 'id'),
+        db.Index('ix_tickets_status_updated_at_id', 'status', 'updated_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(50), default='aberto')  # aberto, em_andamento, resolvido, fechado
     priority = db.Column(db.String(20), default='media')  # baixa, media, alta, critica
-    vendor = db.Column(db.String(120), nullable=True)  # firma terceirizada
+    vendor = db.Column(db.String(120), nullable=True)  # firma terceirizada (como digitada)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'), nullable=True, index=True)  # resolvido de `vendor` (app/vendors.py)
     assignee = db.Column(db.String(120), nullable=True)  # responsável interno
 
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    interactions = db.relationship('Interaction', backref='ticket', lazy=True, cascade='all, delete-orphan')
-
-    @property
-    def last_vendor_contact_at(self):
-        if not self.vendor:
-            return None
-        vendor_key = (self.vendor or '').strip().lower()
-        if not vendor_key:
-            return None
-        times = [i.created_at for i in self.interactions if i.author and vendor_key in i.author.strip().lower()]
-        return max(times) if times else None
-
-    @property
-    def last_contact_at(self):
-        if self.interactions:
-            return max((i.created_at for i in self.interactions), default=self.created_at)
-        return self.created_at
-
-    @property
+    # Desnormalizados a partir de interactions (ver refresh_contact_columns)
+    last_contact_at = db.Column(db.DateTime, nullable=True, index=True)
+    last_vendor_contact_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    # Chave '<lote>:<linha>' da importação em massa, para reler os ids no MySQL (app/importer.py)
+    import_key = db.Column(db.String(40), nullable=True, index=True)
+
+    # Não iterar em páginas: usar queries.interaction_page (pode haver milhares).
+    # Exclusão pelo ON DELETE CASCADE do banco, sem carregar as interações na sessão
+    interactions = db.relationship('Interaction', backref='ticket', lazy=True, cascade='all, delete-orphan',
+                                   passive_deletes=True)
+
+    @staticmethod
+    def stale_cutoff():
+        return datetime.utcnow() - timedelta(hours=STALE_HOURS)
+
+    @hybrid_property
     def is_stale_24h(self) -> bool:
         try:
             delta = datetime.utcnow() - (self.last_contact_at or self.created_at)
         except Exception:
             return False
         # Considerar alerta apenas se não estiver fechado
-        return self.status != 'fechado' and delta.total_seconds() > 24*3600
+        return self.status != 'fechado' and delta.total_seconds() > STALE_HOURS*3600
+
+    @is_stale_24h.expression
+    def is_stale_24h(cls):
+        return and_(cls.status != 'fechado', func.coalesce(cls.last_contact_at, cls.created_at) < cls.stale_cutoff())
 
 
 class Interaction(db.Model):
     __tablename__ = 'interactions'
+    __table_args__ = (
+        # Linha do tempo do chamado por cursor em (created_at, id)
+        db.Index('ix_interactions_ticket_id_created_at_id', 'ticket_id', 'created_at', 'id'),
+        # Último contato da terceirizada e relatórios por terceirizada
+        db.Index('ix_interactions_ticket_id_vendor_id_created_at', 'ticket_id', 'vendor_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False, index=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id', ondelete='CASCADE'), nullable=False, index=True)
     content = db.Column(db.Text, nullable=False)
     author = db.Column(db.String(120), nullable=False)  # nome do autor (terceirizada/usuário)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'), nullable=True)  # terceirizada do autor, resolvida na escrita
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Vendor(db.Model):
+    """Terceirizada; `key` é o nome normalizado (app/vendors.py:vendor_key)."""
+    __tablename__ = 'vendors'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    key = db.Column(db.String(120), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    aliases = db.relationship('VendorAlias', backref='vendor', lazy=True, cascade='all, delete-orphan',
+                              passive_deletes=True)
+
+
+class VendorAlias(db.Model):
+    """Outro nome pelo qual a terceirizada aparece nos chamados e nos autores das interações."""
+    __tablename__ = 'vendor_aliases'
+    id = db.Column(db.Integer, primary_key=True)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id', ondelete='CASCADE'), nullable=False, index=True)
+    key = db.Column(db.String(120), nullable=False, unique=True)
+
+
+class TicketChange(db.Model):
+    """Feed de alterações (seq crescente) lido pelas páginas abertas via SSE (app/changes.py)."""
+    __tablename__ = 'ticket_changes'
+    __table_args__ = (
+        db.Index('ix_ticket_changes_created_by_seq', 'created_by', 'seq'),  # TicketQuery.version()
+        db.Index('ix_ticket_changes_ticket_id_seq', 'ticket_id', 'seq'),  # ETag do detalhe na API
+        {'sqlite_autoincrement': True},  # seq nunca reutilizado após a limpeza
+    )
+    seq = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, nullable=False)  # sem FK: registra também exclusões
+    created_by = db.Column(db.Integer, nullable=True)  # criador do chamado, para filtrar por permissão
+    kind = db.Column(db.String(12), nullable=False)  # ticket, interaction, delete
+    interaction_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class OutboxMessage(db.Model):
+    """Notificação pendente, gravada na mesma transação da rota e entregue pelo worker (app/outbox.py)."""
+    __tablename__ = 'outbox'
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # email, whatsapp
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    claimed_by = db.Column(db.String(32), nullable=True, index=True)  # token do worker que reservou
+    provider = db.Column(db.String(20), nullable=True)  # provedor que entregou
+    provider_status = db.Column(db.Text, nullable=True)  # JSON {provedor: último resultado}
+    last_error = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+
+class StaleDigest(db.Model):
+    """Registro dos resumos de chamados estagnados já enviados (um por usuário por janela)."""
+    __tablename__ = 'stale_digests'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'window_start', name='uq_stale_digests_user_window'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class TicketStat(db.Model):
+    """Contagem de chamados por dimensão (status, priority, vendor, assignee), mantida por app/stats.py."""
+    __tablename__ = 'ticket_stats'
+    dimension = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.String(120), primary_key=True)  # '' para vazio/nulo
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+def refresh_contact_columns(connection, ticket_ids):
+    """Recalcula last_contact_at/last_vendor_contact_at dos tickets informados via SQL."""
+    ids = sorted({int(i) for i in ticket_ids if i is not None})
+    if not ids:
+        return
+    tickets = Ticket.__table__
+    inter = Interaction.__table__
+    last_any = (select(func.max(inter.c.created_at))
+                .where(inter.c.ticket_id == tickets.c.id)
+                .scalar_subquery())
+    # vendor_id das interações é resolvido na escrita: busca direta no índice (ticket_id, vendor_id, created_at)
+    last_vendor = (select(func.max(inter.c.created_at))
+                   .where(inter.c.ticket_id == tickets.c.id,
+                          inter.c.vendor_id == tickets.c.vendor_id)
+                   .scalar_subquery())
+    stmt = (update(tickets)
+            .where(tickets.c.id.in_(ids))
+            .values(last_contact_at=func.coalesce(last_any, tickets.c.created_at),
+                    last_vendor_contact_at=last_vendor,
+                    # interação não altera updated_at do chamado
+                    updated_at=tickets.c.updated_at))
+    connection.execute(stmt)
+
+
+@event.listens_for(Ticket, 'before_insert')
+def _ticket_before_insert(mapper, connection, target):
+    if target.created_at is None:
+        target.created_at = datetime.utcnow()
+    if target.last_contact_at is None:
+        target.last_contact_at = target.created_at
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_contact_changes(session, flush_context):
+    pending = session.info.setdefault('contact_refresh', set())
+    for obj in session.new:
+        if isinstance(obj, Interaction):
+            pending.add(obj.ticket_id)
+    for obj in session.dirty:
+        if isinstance(obj, Interaction):
+            attrs = inspect(obj).attrs
+            if any(attrs[a].history.has_changes() for a in ('ticket_id', 'created_at', 'vendor_id')):
+                pending.add(obj.ticket_id)
+                # interação movida de chamado: recalcular o anterior também
+                pending.update(attrs.ticket_id.history.deleted or ())
+        elif isinstance(obj, Ticket) and inspect(obj).attrs.vendor_id.history.has_changes():
+            pending.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Interaction):
+            pending.add(obj.ticket_id)
+    pending.discard(None)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_contact_changes(session, flush_context):
+    pending = session.info.pop('contact_refresh', None)
+    if not pending:
+        return
+    refresh_contact_columns(session.connection(), pending)
+    for ticket_id in pending:
+        ticket = session.identity_map.get(session.identity_key(Ticket, ticket_id))
+        if ticket is not None:
+            session.expire(ticket, ['last_contact_at', 'last_vendor_contact_at'])
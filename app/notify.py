@@ -1,68 +1,216 @@
+import json
 import os
-import requests
+import threading
+import time
+
+from .metrics import record_http
 
 SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY')
 SENDGRID_FROM = os.getenv('SENDGRID_FROM', 'no-reply@example.com')
+SENDGRID_API_URL = os.getenv('SENDGRID_API_URL', 'https://api.sendgrid.com')
 
 MAILGUN_API_KEY = os.getenv('MAILGUN_API_KEY')
 MAILGUN_DOMAIN = os.getenv('MAILGUN_DOMAIN')
 MAILGUN_FROM = os.getenv('MAILGUN_FROM', 'no-reply@example.com')
+MAILGUN_API_URL = os.getenv('MAILGUN_API_URL', 'https://api.mailgun.net')
 
 WHATSAPP_TOKEN = os.getenv('WHATSAPP_TOKEN')
 WHATSAPP_PHONE_ID = os.getenv('WHATSAPP_PHONE_ID')
+WHATSAPP_API_URL = os.getenv('WHATSAPP_API_URL', 'https://graph.facebook.com')
+
+NOTIFY_TIMEOUT = float(os.getenv('NOTIFY_TIMEOUT', '10'))
+NOTIFY_RETRIES = int(os.getenv('NOTIFY_RETRIES', '2'))
+NOTIFY_POOL_SIZE = int(os.getenv('NOTIFY_POOL_SIZE', '10'))
+
+# Limites de destinatários por requisição dos provedores
+SENDGRID_BATCH_MAX = 1000
+MAILGUN_BATCH_MAX = 1000
+
+
+class Notifier:
+    """Cliente compartilhado (thread-safe) com um pool keep-alive por provedor.
+
+    Cada provedor tem sua própria `requests.Session`, então mensagens
+    seguidas reaproveitam a conexão TCP/TLS. O POST não é idempotente: aqui
+    só se repete o que certamente não chegou ao provedor (falha de conexão e
+    429/503 com Retry-After); o resto fica para o backoff do outbox.
+    """
+
+    def __init__(self, timeout=NOTIFY_TIMEOUT, retries=NOTIFY_RETRIES, pool_size=NOTIFY_POOL_SIZE):
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, provider):
+        sess = self._sessions.get(provider)
+        if sess is None:
+            with self._lock:
+                sess = self._sessions.get(provider)
+                if sess is None:
+                    sess = self._sessions[provider] = self._new_session()
+        return sess
+
+    def _new_session(self):
+        # requests/urllib3 só são carregados quando há envio (worker do outbox)
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        class SendRetry(Retry):
+            def is_retry(self, method, status_code, has_retry_after=False):
+                # Recusa explícita do provedor (mensagem não aceita); sem Retry-After, o outbox decide
+                return has_retry_after and super().is_retry(method, status_code, has_retry_after)
+
+        retry = SendRetry(
+            total=self.retries,
+            connect=self.retries,
+            read=0,  # timeout de leitura: o provedor pode já ter aceitado a mensagem
+            other=0,
+            backoff_factor=0.5,
+            status_forcelist=(429, 503),
+            allowed_methods=frozenset({'POST'}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        sess = requests.Session()
+        sess.mount('https://', adapter)
+        sess.mount('http://', adapter)
+        return sess
+
+    def close(self):
+        with self._lock:
+            for sess in self._sessions.values():
+                sess.close()
+            self._sessions.clear()
+
+    def _post(self, provider, url, **kwargs):
+        started = time.perf_counter()
+        ok = False
+        try:
+            r = self.session(provider).post(url, timeout=self.timeout, **kwargs)
+            ok = r.ok
+        finally:
+            record_http(provider, time.perf_counter() - started, ok)
+        return r.ok, r.text
+
+    # SendGrid
+
+    def send_email_sendgrid(self, to, subject, html):
+        return self.send_email_sendgrid_batch([to], subject, html)
+
+    def send_email_sendgrid_batch(self, recipients, subject, html):
+        """Um único POST com uma `personalization` por destinatário (cada um recebe sua cópia)."""
+        if not SENDGRID_API_KEY:
+            return False, 'SENDGRID_API_KEY ausente'
+        url = f'{SENDGRID_API_URL}/v3/mail/send'
+        headers = {'Authorization': f'Bearer {SENDGRID_API_KEY}', 'Content-Type': 'application/json'}
+        ok, resp = True, ''
+        for chunk in _chunks(recipients, SENDGRID_BATCH_MAX):
+            data = {
+                'personalizations': [{'to': [{'email': to}]} for to in chunk],
+                'from': {'email': SENDGRID_FROM},
+                'subject': subject,
+                'content': [{'type': 'text/html', 'value': html}]
+            }
+            ok, resp = self._post('sendgrid', url, json=data, headers=headers)
+            if not ok:
+                return ok, resp
+        return ok, resp
+
+    # Mailgun
+
+    def send_email_mailgun(self, to, subject, html):
+        return self.send_email_mailgun_batch([to], subject, html)
+
+    def send_email_mailgun_batch(self, recipients, subject, html):
+        """Batch sending: vários `to` + recipient-variables, uma mensagem individual por destinatário."""
+        if not MAILGUN_API_KEY or not MAILGUN_DOMAIN:
+            return False, 'MAILGUN config ausente'
+        url = f'{MAILGUN_API_URL}/v3/{MAILGUN_DOMAIN}/messages'
+        ok, resp = True, ''
+        for chunk in _chunks(recipients, MAILGUN_BATCH_MAX):
+            data = {
+                'from': MAILGUN_FROM,
+                'to': list(chunk),
+                'subject': subject,
+                'html': html
+            }
+            if len(chunk) > 1:
+                # Sem recipient-variables o Mailgun mostraria todos os destinatários no "To"
+                data['recipient-variables'] = json.dumps({to: {} for to in chunk})
+            ok, resp = self._post('mailgun', url, auth=('api', MAILGUN_API_KEY), data=data)
+            if not ok:
+                return ok, resp
+        return ok, resp
+
+    def send_email(self, to, subject, html):
+        return self.send_email_batch([to], subject, html)
+
+    def send_email_batch(self, recipients, subject, html):
+        # Tenta SendGrid, cai para Mailgun
+        ok, resp = self.send_email_sendgrid_batch(recipients, subject, html)
+        if ok:
+            return True, resp
+        return self.send_email_mailgun_batch(recipients, subject, html)
+
+    # WhatsApp
+
+    def send_whatsapp(self, to_e164: str, text: str):
+        """Envia mensagem via WhatsApp Cloud API. 'to_e164' deve incluir DDI (ex.: 5599999999999)."""
+        if not WHATSAPP_TOKEN or not WHATSAPP_PHONE_ID:
+            return False, 'Config WhatsApp ausente'
+        url = f'{WHATSAPP_API_URL}/v17.0/{WHATSAPP_PHONE_ID}/messages'
+        headers = {
+            'Authorization': f'Bearer {WHATSAPP_TOKEN}',
+            'Content-Type': 'application/json'
+        }
+        payload = {
+            'messaging_product': 'whatsapp',
+            'to': to_e164,
+            'type': 'text',
+            'text': {'body': text}
+        }
+        return self._post('whatsapp', url, json=payload, headers=headers)
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_notifier() -> Notifier:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Notifier()
+    return _default
 
 
 def send_email_sendgrid(to, subject, html):
-    if not SENDGRID_API_KEY:
-        return False, 'SENDGRID_API_KEY ausente'
-    url = 'https://api.sendgrid.com/v3/mail/send'
-    data = {
-        'personalizations': [{'to': [{'email': to}]}],
-        'from': {'email': SENDGRID_FROM},
-        'subject': subject,
-        'content': [{'type': 'text/html', 'value': html}]
-    }
-    headers = {'Authorization': f'Bearer {SENDGRID_API_KEY}', 'Content-Type': 'application/json'}
-    r = requests.post(url, json=data, headers=headers, timeout=10)
-    return r.ok, r.text
+    return get_notifier().send_email_sendgrid(to, subject, html)
 
 
 def send_email_mailgun(to, subject, html):
-    if not MAILGUN_API_KEY or not MAILGUN_DOMAIN:
-        return False, 'MAILGUN config ausente'
-    url = f'https://api.mailgun.net/v3/{MAILGUN_DOMAIN}/messages'
-    data = {
-        'from': MAILGUN_FROM,
-        'to': to,
-        'subject': subject,
-        'html': html
-    }
-    r = requests.post(url, auth=('api', MAILGUN_API_KEY), data=data, timeout=10)
-    return r.ok, r.text
+    return get_notifier().send_email_mailgun(to, subject, html)
 
 
 def send_email(to, subject, html):
-    # Tenta SendGrid, cai para Mailgun
-    ok, resp = send_email_sendgrid(to, subject, html)
-    if ok:
-        return True, resp
-    return send_email_mailgun(to, subject, html)
+    return get_notifier().send_email(to, subject, html)
+
+
+def send_email_batch(recipients, subject, html):
+    return get_notifier().send_email_batch(recipients, subject, html)
 
 
 def send_whatsapp(to_e164: str, text: str):
     """Envia mensagem via WhatsApp Cloud API. 'to_e164' deve incluir DDI (ex.: 5599999999999)."""
-    if not WHATSAPP_TOKEN or not WHATSAPP_PHONE_ID:
-        return False, 'Config WhatsApp ausente'
-    url = f'https://graph.facebook.com/v17.0/{WHATSAPP_PHONE_ID}/messages'
-    headers = {
-        'Authorization': f'Bearer {WHATSAPP_TOKEN}',
-        'Content-Type': 'application/json'
-    }
-    payload = {
-        'messaging_product': 'whatsapp',
-        'to': to_e164,
-        'type': 'text',
-        'text': {'body': text}
-    }
-    r = requests.post(url, json=payload, headers=headers, timeout=10)
-    return r.ok, r.text
+    return get_notifier().send_whatsapp(to_e164, text)
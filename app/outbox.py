@@ -0,0 +1,191 @@
+"""Fila persistente de notificações (tabela `outbox`).
+
+As rotas apenas gravam a mensagem na sessão corrente (`enqueue_email`,
+`enqueue_whatsapp`), no mesmo commit da alteração do chamado. O worker
+(`flask outbox worker` ou `start_worker_thread`) reivindica lotes de
+mensagens vencidas, entrega em paralelo via app/notify.py e reagenda as
+falhas com backoff exponencial.
+"""
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, func, or_, update
+
+from . import notify
+from .extensions import db
+from .models import OutboxMessage
+
+BATCH_SIZE = 50
+CONCURRENCY = 4
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 30  # segundos; 30s, 60s, 2min, 4min...
+BACKOFF_MAX = 3600
+LEASE = timedelta(minutes=5)  # mensagens 'sending' mais antigas que isso são retomadas
+
+
+def enqueue_email(to, subject, html):
+    msg = OutboxMessage(channel='email', recipient=to, subject=subject, body=html)
+    db.session.add(msg)
+    return msg
+
+
+def enqueue_whatsapp(to_e164, text):
+    msg = OutboxMessage(channel='whatsapp', recipient=to_e164, body=text)
+    db.session.add(msg)
+    return msg
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX))
+
+
+def _call(provider, fn, *args):
+    try:
+        ok, resp = fn(*args)
+    except Exception as exc:  # timeout, conexão recusada...
+        ok, resp = False, f'{type(exc).__name__}: {exc}'
+    return provider, ok, str(resp)[:500]
+
+
+def deliver(channel, recipients, subject, body):
+    """Tenta os provedores do canal em ordem; retorna (provedor ou None, {provedor: resultado}).
+
+    Emails com o mesmo assunto/corpo seguem numa única requisição em lote.
+    """
+    client = notify.get_notifier()
+    if channel == 'email':
+        attempts = [('sendgrid', client.send_email_sendgrid_batch), ('mailgun', client.send_email_mailgun_batch)]
+        args = (recipients, subject, body)
+    elif channel == 'whatsapp':
+        attempts = [('whatsapp', client.send_whatsapp)]
+        args = (recipients[0], body)
+    else:
+        return None, {channel: 'canal desconhecido'}
+    status = {}
+    for name, fn in attempts:
+        provider, ok, resp = _call(name, fn, *args)
+        status[provider] = 'ok' if ok else resp
+        if ok:
+            return provider, status
+    return None, status
+
+
+def _group(batch):
+    """Agrupa emails idênticos para envio em lote; WhatsApp segue um por mensagem."""
+    groups = {}
+    for msg in batch:
+        key = (msg.channel, msg.subject, msg.body) if msg.channel == 'email' else ('msg', msg.id)
+        groups.setdefault(key, []).append(msg)
+    return list(groups.values())
+
+
+def claim_batch(limit=BATCH_SIZE, now=None):
+    """Reserva mensagens vencidas para este worker; seguro com vários workers."""
+    now = now or datetime.utcnow()
+    due = or_(
+        and_(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now),
+        and_(OutboxMessage.status == 'sending', OutboxMessage.locked_until < now),
+    )
+    ids = [i for (i,) in db.session.query(OutboxMessage.id).filter(due)
+           .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id).limit(limit)]
+    if not ids:
+        return []
+    # Só fica com as linhas que ninguém reservou entre o SELECT e o UPDATE
+    token = uuid.uuid4().hex
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(ids), due)
+        .values(status='sending', locked_until=now + LEASE, claimed_by=token)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return OutboxMessage.query.filter(OutboxMessage.claimed_by == token).all()
+
+
+def deliver_pending(limit=BATCH_SIZE, concurrency=CONCURRENCY):
+    """Processa um lote; retorna quantas mensagens foram tratadas."""
+    batch = claim_batch(limit)
+    if not batch:
+        return 0
+    groups = _group(batch)
+    jobs = [(g[0].channel, [m.recipient for m in g], g[0].subject, g[0].body) for g in groups]
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(jobs)))) as pool:
+        results = list(pool.map(lambda job: deliver(*job), jobs))
+    now = datetime.utcnow()
+    for msg, (provider, status) in ((m, res) for g, res in zip(groups, results) for m in g):
+        msg.attempts += 1
+        msg.locked_until = msg.claimed_by = None
+        msg.provider_status = json.dumps(status, ensure_ascii=False)
+        if provider:
+            msg.status, msg.provider, msg.sent_at, msg.last_error = 'sent', provider, now, None
+        else:
+            msg.last_error = '; '.join(f'{k}: {v}' for k, v in status.items())
+            if msg.attempts >= MAX_ATTEMPTS:
+                msg.status = 'failed'
+            else:
+                msg.status, msg.next_attempt_at = 'pending', now + backoff(msg.attempts)
+    db.session.commit()
+    return len(batch)
+
+
+def run_worker(interval=2.0, limit=BATCH_SIZE, concurrency=CONCURRENCY, once=False, stop=None):
+    while not (stop and stop.is_set()):
+        try:
+            handled = deliver_pending(limit, concurrency)
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+        if once:
+            return handled
+        if not handled:
+            stop.wait(interval) if stop else time.sleep(interval)
+
+
+def start_worker_thread(app, interval=2.0):
+    """Worker em thread daemon no próprio processo (útil com um único worker web)."""
+    stop = threading.Event()
+
+    def target():
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    run_worker(interval=interval, stop=stop)
+                except Exception:
+                    app.logger.exception('Falha no worker do outbox')
+                    stop.wait(interval)
+
+    thread = threading.Thread(target=target, name='outbox-worker', daemon=True)
+    thread.start()
+    return stop
+
+
+outbox_cli = AppGroup('outbox', help='Fila de notificações.')
+
+
+@outbox_cli.command('worker')
+@click.option('--interval', default=2.0, show_default=True, help='Espera (s) quando a fila está vazia.')
+@click.option('--batch', 'limit', default=BATCH_SIZE, show_default=True)
+@click.option('--concurrency', default=CONCURRENCY, show_default=True)
+@click.option('--once', is_flag=True, help='Processa um lote e sai.')
+def worker_command(interval, limit, concurrency, once):
+    """Entrega as notificações pendentes."""
+    handled = run_worker(interval=interval, limit=limit, concurrency=concurrency, once=once)
+    if once:
+        click.echo(f'{handled} mensagem(ns) processada(s)')
+
+
+@outbox_cli.command('status')
+def status_command():
+    """Quantidade de mensagens por status."""
+    rows = (db.session.query(OutboxMessage.status, func.count(OutboxMessage.id))
+            .group_by(OutboxMessage.status).all())
+    for status, n in sorted(rows):
+        click.echo(f'{status}: {n}')
@@ -0,0 +1,91 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import and_, or_
+
+
+@dataclass
+class Keyset:
+    """Ordem decrescente por (colunas...) usada na paginação por cursor."""
+    columns: tuple
+    values: Callable  # linha -> tupla com os valores das colunas
+    types: tuple  # conversores para decodificar cada valor do cursor
+    item: Callable = lambda row: row  # linha -> objeto exibido
+
+
+def _to_json(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([_to_json(v) for v in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, types):
+    """Retorna a tupla de valores ou None se o cursor for inválido."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        values = json.loads(raw)
+        if len(values) != len(types):
+            return None
+        return tuple(conv(v) for conv, v in zip(types, values))
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def _beyond(columns, values, older: bool):
+    """Comparação lexicográfica (a, b) < (x, y) portável entre SQLite e MySQL."""
+    col, rest = columns[0], columns[1:]
+    val, rest_vals = values[0], values[1:]
+    strict = col < val if older else col > val
+    if not rest:
+        return strict
+    return or_(strict, and_(col == val, _beyond(rest, rest_vals, older)))
+
+
+@dataclass
+class Page:
+    items: list = field(default_factory=list)
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+def keyset_page(query, keyset: Keyset, per_page: int, after: str = '', before: str = '') -> Page:
+    """Paginação por cursor na ordem decrescente de `keyset`.
+
+    `after` avança para itens seguintes, `before` volta para os anteriores.
+    Usa os índices compostos (..., updated_at, id) em vez de OFFSET.
+    """
+    after_key = decode_cursor(after, keyset.types)
+    before_key = decode_cursor(before, keyset.types) if not after_key else None
+
+    if before_key:
+        query = query.filter(_beyond(keyset.columns, before_key, older=False))
+        rows = query.order_by(*[c.asc() for c in keyset.columns]).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        page = Page(items=[keyset.item(r) for r in rows])
+        if rows:
+            page.next_cursor = encode_cursor(keyset.values(rows[-1]))
+            if has_more:
+                page.prev_cursor = encode_cursor(keyset.values(rows[0]))
+        return page
+
+    if after_key:
+        query = query.filter(_beyond(keyset.columns, after_key, older=True))
+    rows = query.order_by(*[c.desc() for c in keyset.columns]).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    page = Page(items=[keyset.item(r) for r in rows])
+    if rows:
+        if has_more:
+            page.next_cursor = encode_cursor(keyset.values(rows[-1]))
+        if after_key:
+            page.prev_cursor = encode_cursor(keyset.values(rows[0]))
+    return page
@@ -0,0 +1,154 @@
+"""Consulta de chamados compartilhada entre listagem e exportações.
+
+`TicketQuery` reúne escopo do usuário, busca, status, ordem e página; a
+listagem usa `page()`, que passa pelo cache de resultados (app/cache.py),
+e as exportações usam `filtered()` para ler tudo em streaming.
+`interaction_page()` pagina a linha do tempo do detalhe do chamado.
+"""
+import hashlib
+from dataclasses import dataclass, astuple
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from .cache import cached, invalidate
+from .extensions import db
+from .models import Interaction, Ticket, TicketChange, STALE_HOURS
+from .pagination import Keyset, Page, keyset_page
+from .search import apply_search, relevance_keyset
+
+TICKETS_BY_UPDATED = Keyset(
+    columns=(Ticket.updated_at, Ticket.id),
+    values=lambda t: (t.updated_at, t.id),
+    types=(datetime.fromisoformat, int),
+)
+
+INTERACTIONS_BY_CREATED = Keyset(
+    columns=(Interaction.created_at, Interaction.id),
+    values=lambda i: (i.created_at, i.id),
+    types=(datetime.fromisoformat, int),
+)
+INTERACTIONS_PER_PAGE = 20
+
+
+@dataclass(frozen=True)
+class TicketRow:
+    """Cópia leve de um chamado para a listagem (serializável no cache)."""
+    id: int
+    title: str
+    status: str
+    priority: str
+    vendor: str | None
+    assignee: str | None
+    created_at: datetime
+    updated_at: datetime
+    last_contact_at: datetime | None
+
+    @classmethod
+    def from_ticket(cls, t):
+        return cls(t.id, t.title, t.status, t.priority, t.vendor, t.assignee,
+                   t.created_at, t.updated_at, t.last_contact_at)
+
+    @property
+    def is_stale_24h(self) -> bool:
+        # Calculado na renderização: muda com o tempo mesmo com a linha em cache
+        try:
+            delta = datetime.utcnow() - (self.last_contact_at or self.created_at)
+        except Exception:
+            return False
+        return self.status != 'fechado' and delta.total_seconds() > STALE_HOURS*3600
+
+
+@dataclass(frozen=True)
+class TicketQuery:
+    user_id: int | None = None  # None = todos os chamados (admin)
+    q: str = ''
+    status: str = ''
+    after: str = ''
+    before: str = ''
+    per_page: int = 50
+
+    @classmethod
+    def for_user(cls, user, args, per_page=50):
+        return cls(
+            user_id=None if user.role == 'admin' else user.id,
+            q=args.get('q', ''),
+            status=args.get('status', ''),
+            after=args.get('after', ''),
+            before=args.get('before', ''),
+            per_page=per_page,
+        )
+
+    @property
+    def order(self):
+        return 'relevance' if self.q else 'updated'
+
+    @property
+    def scope(self):
+        return 'all' if self.user_id is None else f'user:{self.user_id}'
+
+    def filtered(self):
+        """Retorna (query filtrada, expressão de relevância ou None)."""
+        query = Ticket.query
+        if self.user_id is not None:
+            query = query.filter_by(created_by=self.user_id)
+        score = None
+        if self.q:
+            query, score = apply_search(query, self.q)
+        if self.status:
+            query = query.filter_by(status=self.status)
+        return query, score
+
+    def matches(self, row):
+        """Se `row` (TicketRow) ainda pertence ao filtro; a busca é conferida no banco."""
+        if self.status and row.status != self.status:
+            return False
+        if not self.q:
+            return True
+        query, _ = self.filtered()
+        return db.session.query(query.filter(Ticket.id == row.id).exists()).scalar()
+
+    def fetch_page(self) -> Page:
+        query, score = self.filtered()
+        # Com busca, ordenar por relevância; sem busca, por atualização
+        if score is not None:
+            query, keyset = query.add_columns(score), relevance_keyset(score)
+        else:
+            keyset = TICKETS_BY_UPDATED
+        page = keyset_page(query, keyset, self.per_page, after=self.after, before=self.before)
+        page.items = [TicketRow.from_ticket(t) for t in page.items]
+        return page
+
+    def version(self):
+        """Muda sempre que algum chamado do escopo muda: uma consulta indexada no feed.
+
+        Toda escrita grava `ticket_changes` com o criador do chamado (app/changes.py),
+        então o maior seq do escopo (índice created_by, seq; para o admin, o da
+        tabela) cobre edições, contatos, criações e exclusões, inclusive duas no
+        mesmo segundo. Se a limpeza do feed apagou tudo do escopo, vale o seq
+        anterior ao mais antigo que restou: nada do escopo mudou depois dele.
+        """
+        last = select(func.max(TicketChange.seq))
+        if self.user_id is None:
+            return db.session.scalar(last)
+        oldest = select(func.min(TicketChange.seq) - 1).scalar_subquery()
+        last = last.where(TicketChange.created_by == self.user_id).scalar_subquery()
+        return db.session.scalar(select(func.coalesce(last, oldest, 0)))
+
+    def cache_key(self):
+        digest = hashlib.sha1(repr(astuple(self) + (self.order,)).encode()).hexdigest()
+        return f'tickets:{digest}'
+
+    def page(self) -> Page:
+        return cached([self.scope], self.cache_key(), self.fetch_page)
+
+
+def interaction_page(ticket_id, after='', per_page=INTERACTIONS_PER_PAGE) -> Page:
+    """Interações do chamado, mais recentes primeiro (índice ticket_id, created_at, id)."""
+    query = Interaction.query.filter(Interaction.ticket_id == ticket_id)
+    return keyset_page(query, INTERACTIONS_BY_CREATED, per_page, after=after)
+
+
+def invalidate_tickets(*creator_ids):
+    """Chamar após qualquer escrita em chamados/interações dos criadores informados."""
+    invalidate('all', *(f'user:{i}' for i in set(creator_ids) if i is not None))
@@ -0,0 +1,131 @@
+"""Leituras em réplicas (`DATABASE_REPLICA_URLS`).
+
+Cada URL vira um bind `replica<N>` do Flask-SQLAlchemy. As rotas marcadas
+com `@replica_reads` (listagem, detalhe, exportações) escolhem uma réplica
+em rodízio e os SELECTs da requisição vão para ela (`RoutingSession` em
+app/extensions.py); escritas continuam no primário. Réplica que falha no
+teste (`SELECT` em `users`, no máximo a cada `REPLICA_CHECK_SECONDS`) ou
+numa consulta sai do rodízio até o próximo teste; sem réplica saudável, lê
+do primário. Depois de um POST/PUT/PATCH/DELETE o usuário lê do primário
+por `REPLICA_STICKY_SECONDS`, para ver o que acabou de gravar mesmo com
+atraso de replicação.
+"""
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request, session
+from sqlalchemy import event, select
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from .extensions import db
+from .models import User
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+PIN_KEY = 'db_primary_until'
+
+
+class Replica:
+    def __init__(self, name, engine, logger):
+        self.name = name
+        self.engine = engine
+        self.logger = logger
+        self.healthy = True
+        self.checked_at = float('-inf')
+        self._lock = threading.Lock()
+        event.listen(engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context):
+        # Só SELECTs vão para a réplica: erro do banco aqui indica réplica fora do ar ou sem o schema
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, DBAPIError):
+            self.mark_down()
+
+    def mark_down(self):
+        if self.healthy:
+            self.logger.warning('Réplica %s fora do rodízio', self.name)
+        self.healthy = False
+        self.checked_at = time.monotonic()
+        self.engine.dispose()  # o próximo teste abre conexões novas em vez de reusar as do pool
+
+    def available(self, interval):
+        if time.monotonic() - self.checked_at < interval:
+            return self.healthy
+        if not self._lock.acquire(blocking=False):
+            return self.healthy  # outra thread já está testando
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(select(User.id).limit(1))
+        except SQLAlchemyError:
+            self.mark_down()
+        else:
+            if not self.healthy:
+                self.logger.info('Réplica %s de volta ao rodízio', self.name)
+            self.healthy = True
+            self.checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+        return self.healthy
+
+
+class ReplicaPool:
+    def __init__(self, replicas, check_interval=10, sticky_seconds=10):
+        self.replicas = replicas
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self._counter = itertools.count()
+        self.reads = {r.name: 0 for r in replicas}
+        self.reads['primary'] = 0
+
+    def pick(self):
+        """Próxima réplica saudável em rodízio, ou None (ler do primário)."""
+        n = len(self.replicas)
+        start = next(self._counter)
+        for i in range(n):
+            replica = self.replicas[(start + i) % n]
+            if replica.available(self.check_interval):
+                self.reads[replica.name] += 1
+                return replica
+        self.reads['primary'] += 1
+        return None
+
+
+def _pinned():
+    return session.get(PIN_KEY, 0) > time.time()
+
+
+def replica_reads(view):
+    """A view só lê: os SELECTs vão para uma réplica, salvo logo após uma escrita do usuário."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        pool = get_replica_pool()
+        if pool.replicas and not _pinned():
+            replica = pool.pick()
+            if replica is not None:
+                db.session.info['replica'] = replica.engine
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _pin_after_write(response):
+    pool = get_replica_pool()
+    if pool.replicas and request.method not in SAFE_METHODS and response.status_code < 500:
+        session[PIN_KEY] = int(time.time()) + pool.sticky_seconds
+    return response
+
+
+def init_replicas(app):
+    keys = sorted(k for k in app.config.get('SQLALCHEMY_BINDS', {}) if k.startswith('replica'))
+    with app.app_context():
+        replicas = [Replica(k, db.engines[k], app.logger) for k in keys]
+    app.extensions['replica_pool'] = ReplicaPool(
+        replicas,
+        check_interval=app.config.get('REPLICA_CHECK_SECONDS', 10),
+        sticky_seconds=app.config.get('REPLICA_STICKY_SECONDS', 10),
+    )
+    if replicas:
+        app.after_request(_pin_after_write)
+
+
+def get_replica_pool():
+    return current_app.extensions['replica_pool']
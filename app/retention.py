@@ -0,0 +1,202 @@
+"""Retenção: remove (e opcionalmente arquiva) chamados fechados antigos.
+
+`flask purge --days 365 --archive arquivo.jsonl` apaga em lotes curtos, um
+por transação, para nunca segurar locks por muito tempo no MySQL. Cada lote
+é limitado em chamados e em interações; as interações vão junto pelo ON
+DELETE CASCADE, e ticket_stats e o índice de busca são ajustados no mesmo
+lote. Um chamado com mais interações que o limite tem as interações
+arquivadas e apagadas antes, em lotes próprios que conferem de novo se ele
+ainda expira (e aparece em várias linhas do arquivo, com o mesmo id). O
+arquivo é gravado em disco (fsync) antes do DELETE: uma falha deixa no
+máximo uma linha repetida, nunca um chamado apagado sem cópia.
+"""
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, select
+
+from .changes import record
+from .extensions import db
+from .models import Interaction, Ticket, refresh_contact_columns
+from .queries import invalidate_tickets
+from .search import get_backend
+from .stats import DIMENSIONS, _key, apply_deltas
+
+PURGE_CHUNK = 500
+PURGE_INTERACTIONS = 5000  # interações por transação (apagadas pelo CASCADE ou em lotes próprios)
+
+
+@dataclass
+class PurgeReport:
+    tickets: int = 0
+    interactions: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return (self.tickets + self.interactions) / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f'{self.tickets} chamado(s) e {self.interactions} interação(ões) removidos em '
+                f'{self.seconds:.1f}s ({self.rows_per_second:.0f} linhas/s)')
+
+
+def expired(cutoff):
+    """Chamados fechados sem atualização desde `cutoff` (índice status, updated_at, id)."""
+    return Ticket.__table__.select().where(Ticket.status == 'fechado', Ticket.updated_at < cutoff)
+
+
+def _sync(fh):
+    fh.flush()
+    try:
+        os.fsync(fh.fileno())
+    except (AttributeError, OSError):
+        pass  # arquivo em memória (io.StringIO), sem descritor
+
+
+def _archive(connection, fh, tickets, where):
+    """Grava os chamados com as interações de `where` e força a escrita em disco."""
+    interactions = {}
+    rows = connection.execute(select(Interaction.__table__).where(where)
+                              .order_by(Interaction.ticket_id, Interaction.created_at, Interaction.id))
+    for i in rows.mappings():
+        interactions.setdefault(i['ticket_id'], []).append(dict(i))
+    for t in tickets:
+        entry = dict(t._mapping, interactions=interactions.get(t.id, []))
+        fh.write(json.dumps(entry, default=datetime.isoformat, ensure_ascii=False) + '\n')
+    _sync(fh)
+
+
+def _fit(tickets, counts, max_interactions):
+    """Maior prefixo de `tickets` com até `max_interactions` interações (ao menos um chamado)."""
+    total = 0
+    for n, t in enumerate(tickets):
+        total += counts.get(t.id, 0)
+        if total > max_interactions and n:
+            return tickets[:n]
+    return tickets
+
+
+def _drain(ticket, cutoff, max_interactions, archive, search):
+    """Arquiva e apaga as interações de um chamado grande em lotes; retorna quantas.
+
+    Cada lote trava o chamado e confere de novo se ele ainda expira. Reaberto
+    ou atualizado no meio do caminho, o chamado fica com o que restou e com
+    último contato e índice de busca recalculados.
+    """
+    removed = 0
+    stmt = (select(Interaction.id).where(Interaction.ticket_id == ticket.id)
+            .order_by(Interaction.id).limit(max_interactions))
+    while True:
+        with db.engine.begin() as connection:
+            current = connection.execute(
+                expired(cutoff).where(Ticket.id == ticket.id).with_for_update()).first()
+            if current is None:
+                if removed:
+                    refresh_contact_columns(connection, [ticket.id])
+                    search.reindex(connection, [ticket.id])
+                    record(connection, [(ticket.id, ticket.created_by, 'ticket')])
+                break
+            ids = connection.execute(stmt.with_for_update()).scalars().all()
+            if not ids:
+                return removed
+            if archive is not None:
+                _archive(connection, archive, [current], Interaction.id.in_(ids))
+            # Sem ajustar último contato/índice de busca a cada lote: o chamado sai logo em seguida
+            connection.execute(delete(Interaction.__table__).where(Interaction.id.in_(ids)))
+        removed += len(ids)
+    if removed:
+        invalidate_tickets(ticket.created_by)
+    return removed
+
+
+def purge(cutoff, chunk=PURGE_CHUNK, archive=None, pause=0.0, progress=None,
+          max_interactions=PURGE_INTERACTIONS):
+    """Remove os chamados de `expired(cutoff)` em lotes de até `chunk` chamados e
+    `max_interactions` interações; retorna o PurgeReport.
+
+    `archive` é um arquivo texto aberto que recebe cada chamado (com as
+    interações) em JSON por linha antes de ser apagado.
+    """
+    report = PurgeReport()
+    search = get_backend(db.engine)
+    started = time.perf_counter()
+    stmt = expired(cutoff).order_by(Ticket.updated_at, Ticket.id).limit(chunk)
+    while True:
+        big = None
+        with db.engine.begin() as connection:
+            tickets = connection.execute(stmt.with_for_update()).all()
+            if not tickets:
+                break
+            counts = dict(connection.execute(
+                select(Interaction.ticket_id, func.count())
+                .where(Interaction.ticket_id.in_([t.id for t in tickets]))
+                .group_by(Interaction.ticket_id)).all())
+            if counts.get(tickets[0].id, 0) > max_interactions:
+                big = tickets[0]
+            else:
+                tickets = _fit(tickets, counts, max_interactions)
+                ids = [t.id for t in tickets]
+                interactions = sum(counts.get(i, 0) for i in ids)
+                if archive is not None:
+                    _archive(connection, archive, tickets, Interaction.ticket_id.in_(ids))
+                connection.execute(delete(Ticket.__table__).where(Ticket.id.in_(ids)))
+                deltas = Counter()
+                for t in tickets:
+                    for dim in DIMENSIONS:
+                        deltas[(dim, _key(getattr(t, dim)))] -= 1
+                apply_deltas(connection, deltas)
+                search.reindex(connection, ids)  # remove as entradas
+                record(connection, [(t.id, t.created_by, 'delete') for t in tickets])
+        if big is not None:
+            # Fora da transação acima: cada lote de interações tem a sua
+            report.interactions += _drain(big, cutoff, max_interactions, archive, search)
+            continue
+        invalidate_tickets(*{t.created_by for t in tickets})
+        report.tickets += len(tickets)
+        report.interactions += interactions
+        report.seconds = time.perf_counter() - started
+        if progress:
+            progress(report)
+        if pause:
+            time.sleep(pause)  # folga para replicação e outras transações entre lotes
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+@click.command('purge')
+@click.option('--days', type=int, default=None,
+              help='Idade mínima (dias desde a última atualização) dos chamados fechados. Padrão: RETENTION_DAYS.')
+@click.option('--chunk', default=PURGE_CHUNK, show_default=True, help='Chamados por transação.')
+@click.option('--archive', type=click.File('a', encoding='utf-8'),
+              help='Acrescenta os chamados removidos (com interações) neste arquivo JSONL.')
+@click.option('--max-interactions', default=PURGE_INTERACTIONS, show_default=True,
+              help='Interações por transação.')
+@click.option('--pause', default=0.0, show_default=True, help='Segundos de espera entre lotes.')
+@click.option('--dry-run', is_flag=True, help='Só conta o que seria removido.')
+@with_appcontext
+def purge_command(days, chunk, max_interactions, archive, pause, dry_run):
+    """Remove chamados fechados mais antigos que a retenção configurada."""
+    days = current_app.config['RETENTION_DAYS'] if days is None else days
+    if days < 1:
+        raise click.BadParameter('precisa ser ao menos 1', param_hint='--days')
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    if dry_run:
+        ids = expired(cutoff).with_only_columns(Ticket.id).subquery()
+        tickets = db.session.scalar(select(func.count()).select_from(ids))
+        interactions = db.session.scalar(select(func.count(Interaction.id)).where(Interaction.ticket_id.in_(select(ids.c.id))))
+        click.echo(f'{tickets} chamado(s) e {interactions} interação(ões) fechados antes de {cutoff:%d/%m/%Y}')
+        return
+
+    def progress(report):
+        click.echo(f'\r{report.tickets} chamados, {report.rows_per_second:.0f} linhas/s', nl=False)
+
+    report = purge(cutoff, chunk, archive, pause, progress, max_interactions)
+    click.echo(('\n' if report.tickets else '') + report.summary())
@@ -1,45 +1,80 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, make_response, Response, jsonify
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, send_file, make_response, Response, jsonify, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from sqlalchemy import or_
-from io import StringIO, BytesIO
-import csv
 from flask import Response
 from datetime import datetime
 import os
-import requests
 
 from .extensions import db
 from .models import User, Ticket, Interaction
-from .forms import LoginForm, TicketForm, InteractionForm, RegisterForm
-from .notify import send_email, send_whatsapp
+from .forms import LoginForm, TicketForm, InteractionForm, RegisterForm, ImportForm, BulkTicketForm
+from .outbox import enqueue_email, enqueue_whatsapp
+from .exporters import EXPORT_HEADERS, export_rows, iter_csv, status_metrics
+from .queries import TicketQuery, interaction_page, invalidate_tickets
+from .stats import get_stats
+from .identity import get_identity_cache
+from .fragments import get_row_cache
+from .replicas import get_replica_pool, replica_reads
+from .metrics import metrics_token_ok, render_metrics
+from .importer import import_tables, open_interactions, open_tables
+from .bulk import BULK_MAX, bulk_delete, bulk_update
+from .changes import concurrent_server, get_hub, last_seq, stream
+from .firebase_auth import InvalidIdToken, get_token_verifier
 
 main_bp = Blueprint('main', __name__)
 
 
 @main_bp.route('/')
 @login_required
+@replica_reads
 def index():
-    q = request.args.get('q', '')
-    status = request.args.get('status', '')
-    query = Ticket.query
-    if current_user.role != 'admin':
-        query = query.filter_by(created_by=current_user.id)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(or_(Ticket.title.ilike(like), Ticket.description.ilike(like), Ticket.vendor.ilike(like)))
-    if status:
-        query = query.filter_by(status=status)
-    tickets = query.order_by(Ticket.updated_at.desc()).all()
-    # Enviar uma notificação simples para chamados estagnados (+24h) do usuário
-    if current_user.role != 'admin':
-        stale = [t for t in tickets if t.is_stale_24h]
-        if stale:
-            subj = "Chamados sem interação há 24h"
-            body = "<p>Você possui chamados sem interação há mais de 24h:</p><ul>" + "".join([f"<li>#{t.id} - {t.title}</li>" for t in stale]) + "</ul>"
-            send_email(current_user.email, subj, body)
+    spec = TicketQuery.for_user(current_user, request.args, current_app.config['TICKETS_PAGE_SIZE'])
+    page = spec.page()
+    stats = get_stats() if current_user.role == 'admin' else None
     t_form = TicketForm()
     t_form.assignee.data = current_user.name  # auto-preencher responsável
-    return render_template('index.html', tickets=tickets, q=q, status=status, t_form=t_form, now=datetime.utcnow())
+    return render_template('index.html', tickets=page.items, page=page, q=spec.q, status=spec.status, stats=stats, t_form=t_form, b_form=BulkTicketForm(), feed_seq=last_seq())
+
+
+@main_bp.get('/stats')
+@login_required
+def ticket_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(get_stats())
+
+
+@main_bp.get('/stats/identity-cache')
+@login_required
+def identity_cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(get_identity_cache().stats())
+
+
+@main_bp.get('/metrics')
+def metrics():
+    # Prometheus com `Authorization: Bearer <METRICS_TOKEN>` ou admin logado
+    if not metrics_token_ok() and not (current_user.is_authenticated and current_user.role == 'admin'):
+        return Response('forbidden\n', status=403, mimetype='text/plain')
+    identity = get_identity_cache().stats()
+    rows = get_row_cache().stats()
+    extra = [
+        '# HELP identity_cache_lookups_total Consultas ao cache de identidade do user_loader.',
+        '# TYPE identity_cache_lookups_total counter',
+        f'identity_cache_lookups_total{{result="hit"}} {identity["hits"]}',
+        f'identity_cache_lookups_total{{result="miss"}} {identity["misses"]}',
+        '# HELP row_cache_lookups_total Linhas da listagem servidas do cache de fragmentos.',
+        '# TYPE row_cache_lookups_total counter',
+        f'row_cache_lookups_total{{result="hit"}} {rows["hits"]}',
+        f'row_cache_lookups_total{{result="miss"}} {rows["misses"]}',
+        '# HELP row_cache_bytes Tamanho do HTML guardado no cache de fragmentos.',
+        '# TYPE row_cache_bytes gauge',
+        f'row_cache_bytes {rows["bytes"]}',
+        '# HELP db_replica_reads_total Requisições só de leitura por destino (réplica ou primário sem réplica saudável).',
+        '# TYPE db_replica_reads_total counter',
+    ]
+    extra += [f'db_replica_reads_total{{target="{name}"}} {n}' for name, n in get_replica_pool().reads.items()]
+    return Response(render_metrics(extra), mimetype='text/plain; version=0.0.4')
 
 
 @main_bp.route('/login', methods=['GET', 'POST'])
@@ -82,13 +117,15 @@ def ticket_new():
             created_by=current_user.id,
         )
         db.session.add(ticket)
-        db.session.commit()
-        # Notificar o criador
+        db.session.flush()
+        # Notificar o criador (entregue pelo worker do outbox, no mesmo commit)
         subj = f"Novo chamado #{ticket.id}: {ticket.title}"
         html = f"<p>Seu chamado foi criado.</p><p>Status: {ticket.status}</p>"
-        send_email(current_user.email, subj, html)
+        enqueue_email(current_user.email, subj, html)
         if current_user.phone_e164:
-            send_whatsapp(current_user.phone_e164.lstrip('+'), f"Novo chamado #{ticket.id}: {ticket.title}")
+            enqueue_whatsapp(current_user.phone_e164.lstrip('+'), f"Novo chamado #{ticket.id}: {ticket.title}")
+        db.session.commit()
+        invalidate_tickets(ticket.created_by)
         flash('Chamado criado', 'success')
         return redirect(url_for('main.index'))
     return render_template('ticket_form.html', form=form, action='Novo')
@@ -114,13 +151,14 @@ def ticket_edit(ticket_id):
             ticket.status = form.status.data
             ticket.priority = form.priority.data
             ticket.vendor = form.vendor.data
-        db.session.commit()
         if ticket.status != old_status:
             subj = f"Chamado #{ticket.id} atualizado para {ticket.status}"
             html = f"<p>Seu chamado mudou de status:</p><p>De: {old_status} → Para: {ticket.status}</p>"
-            send_email(ticket.creator.email, subj, html)
+            enqueue_email(ticket.creator.email, subj, html)
             if ticket.creator.phone_e164:
-                send_whatsapp(ticket.creator.phone_e164.lstrip('+'), f"Chamado #{ticket.id}: {old_status} → {ticket.status}")
+                enqueue_whatsapp(ticket.creator.phone_e164.lstrip('+'), f"Chamado #{ticket.id}: {old_status} → {ticket.status}")
+        db.session.commit()
+        invalidate_tickets(ticket.created_by)
         flash('Chamado atualizado', 'success')
         return redirect(url_for('main.ticket_detail', ticket_id=ticket.id))
     return render_template('ticket_form.html', form=form, action='Editar')
@@ -128,13 +166,27 @@ def ticket_edit(ticket_id):
 
 @main_bp.route('/tickets/<int:ticket_id>')
 @login_required
+@replica_reads
 def ticket_detail(ticket_id):
     ticket = Ticket.query.get_or_404(ticket_id)
     if current_user.role != 'admin' and ticket.created_by != current_user.id:
         flash('Sem permissão para visualizar este chamado', 'warning')
         return redirect(url_for('main.index'))
     i_form = InteractionForm()
-    return render_template('ticket_detail.html', ticket=ticket, i_form=i_form, now=datetime.utcnow())
+    page = interaction_page(ticket.id)
+    return render_template('ticket_detail.html', ticket=ticket, i_form=i_form, page=page, feed_seq=last_seq(),
+                           now=datetime.utcnow())
+
+
+@main_bp.route('/tickets/<int:ticket_id>/interactions')
+@login_required
+def interaction_list(ticket_id):
+    # Fragmento com a próxima página da linha do tempo (rolagem infinita do detalhe)
+    ticket = Ticket.query.get_or_404(ticket_id)
+    if current_user.role != 'admin' and ticket.created_by != current_user.id:
+        return Response('forbidden\n', status=403, mimetype='text/plain')
+    page = interaction_page(ticket_id, after=request.args.get('after', ''))
+    return render_template('_interactions.html', ticket_id=ticket_id, page=page)
 
 
 @main_bp.route('/tickets/<int:ticket_id>/delete', methods=['POST'])
@@ -144,12 +196,72 @@ def ticket_delete(ticket_id):
     if current_user.role != 'admin' and ticket.created_by != current_user.id:
         flash('Sem permissão para excluir', 'warning')
         return redirect(url_for('main.index'))
+    created_by = ticket.created_by
     db.session.delete(ticket)
     db.session.commit()
+    invalidate_tickets(created_by)
     flash('Chamado excluído', 'success')
     return redirect(url_for('main.index'))
 
 
+@main_bp.route('/events')
+@login_required
+def events():
+    # SSE: alterações de chamados (listagem) ou de um chamado (?ticket=<id>, detalhe)
+    ticket_id = request.args.get('ticket', type=int)
+    if ticket_id is not None:
+        ticket = Ticket.query.get_or_404(ticket_id)
+        if current_user.role != 'admin' and ticket.created_by != current_user.id:
+            return Response('forbidden\n', status=403, mimetype='text/plain')
+    since = request.headers.get('Last-Event-ID', type=int) or request.args.get('since', type=int)
+    db.session.close()  # não prender uma conexão do pool enquanto o stream fica aberto
+    user_id = None if current_user.role == 'admin' else current_user.id
+    # Filtro da listagem aberta: linhas que deixam de atendê-lo saem da página
+    spec = None
+    if ticket_id is None and (request.args.get('q') or request.args.get('status')):
+        spec = TicketQuery.for_user(current_user, request.args)
+    sub, replay = get_hub().subscribe(user_id, ticket_id, since)
+    if concurrent_server(request.environ):
+        body = stream(sub, replay, max_seconds=current_app.config['SSE_MAX_SECONDS'], spec=spec)
+    else:
+        # Worker síncrono: um stream longo prenderia o worker inteiro. Entrega o que
+        # houver e fecha; o navegador volta em SSE_SYNC_RETRY_SECONDS com Last-Event-ID
+        body = stream(sub, replay, max_seconds=0, retry=current_app.config['SSE_SYNC_RETRY_SECONDS'], spec=spec)
+    return Response(stream_with_context(body), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@main_bp.route('/tickets/bulk', methods=['POST'])
+@login_required
+def ticket_bulk():
+    back = url_for('main.index', q=request.form.get('q') or None, status=request.form.get('status_filter') or None)
+    form = BulkTicketForm()
+    ids = [int(i) for i in request.form.getlist('ids') if i.isdigit()]
+    if not ids:
+        flash('Selecione ao menos um chamado', 'warning')
+        return redirect(back)
+    if not form.validate_on_submit():
+        flash('Ação inválida', 'warning')
+        return redirect(back)
+    if len(set(ids)) > BULK_MAX:
+        return Response(f'no máximo {BULK_MAX} chamados por vez\n', status=400, mimetype='text/plain')
+    action = form.action.data
+    try:
+        if action == 'delete':
+            result = bulk_delete(current_user, ids)
+            msg = f'{result.changed} chamado(s) excluído(s)'
+        else:
+            result = bulk_update(current_user, ids, {action: getattr(form, action).data or None})
+            msg = f'{result.changed} chamado(s) atualizado(s)'
+    except PermissionError as e:
+        flash(str(e).capitalize(), 'warning')
+        return redirect(back)
+    if result.skipped:
+        msg += f'; {result.skipped} ignorado(s) (sem permissão ou inexistentes)'
+    flash(msg, 'success' if not result.skipped else 'warning')
+    return redirect(back)
+
+
 @main_bp.route('/tickets/<int:ticket_id>/interactions', methods=['POST'])
 @login_required
 def interaction_add(ticket_id):
@@ -167,6 +279,7 @@ def interaction_add(ticket_id):
         )
         db.session.add(inter)
         db.session.commit()
+        invalidate_tickets(ticket.created_by)
         flash('Interação adicionada', 'success')
     else:
         flash('Erro ao adicionar interação', 'danger')
@@ -175,74 +288,15 @@ def interaction_add(ticket_id):
 
 @main_bp.route('/export/csv')
 @login_required
+@replica_reads
 def export_csv():
-    q = request.args.get('q', '')
-    status = request.args.get('status', '')
-    query = Ticket.query
-    if current_user.role != 'admin':
-        query = query.filter_by(created_by=current_user.id)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(or_(Ticket.title.ilike(like), Ticket.description.ilike(like), Ticket.vendor.ilike(like)))
-    if status:
-        query = query.filter_by(status=status)
-    tickets = query.order_by(Ticket.updated_at.desc()).all()
-
-    status_labels = {
-        'aberto': 'Aberto',
-        'pendente_totvs': 'Pendente TOTVS',
-        'pendente_feso': 'Pendente FESO',
-        'validacao_cliente': 'Validação Cliente',
-        'fechado': 'Fechado',
-    }
-
-    def fmt_dt(dt):
-        return dt.strftime('%d/%m/%Y %H:%M') if dt else ''
-
-    def fmt_td(td):
-        try:
-            total = int(td.total_seconds())
-        except Exception:
-            return ''
-        h, rem = divmod(total, 3600)
-        m, s = divmod(rem, 60)
-        return f"{h:02d}:{m:02d}:{s:02d}"
-
-    si = StringIO()
-    # Dica para Excel usar ';' como separador
-    si.write('sep=;\n')
-    cw = csv.writer(si, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-
-    cw.writerow(['ID', 'Título', 'Status', 'Prioridade', 'Terceirizada', 'Responsável', 'Criado por', 'Aberto há (HH:MM:SS)', 'Criado em', 'Atualizado em', 'Última interação', 'Alerta 24h'])
-
-    now = datetime.utcnow()
-    for t in tickets:
-        aberto_ha = fmt_td(now - (t.created_at or now))
-        last_inter = getattr(t, 'last_contact_at', None)
-        cw.writerow([
-            t.id,
-            t.title,
-            status_labels.get(t.status, t.status),
-            t.priority,
-            t.vendor or '',
-            t.assignee or '',
-            t.creator.email,
-            aberto_ha,
-            fmt_dt(t.created_at),
-            fmt_dt(t.updated_at),
-            fmt_dt(last_inter),
-            'Sim' if getattr(t, 'is_stale_24h', False) else 'Não'
-        ])
-
-    output = si.getvalue()
-    # Adicionar BOM para Excel reconhecer UTF-8
-    output = '\ufeff' + output
+    query, _ = TicketQuery.for_user(current_user, request.args).filtered()
 
     ts = datetime.utcnow().strftime('%Y%m%d_%H%M')
     filename = f'chamados_{ts}.csv'
 
     return Response(
-        output,
+        stream_with_context(iter_csv(export_rows(query))),
         mimetype='text/csv; charset=utf-8',
         headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
@@ -250,87 +304,42 @@ def export_csv():
 
 @main_bp.route('/export/xlsx')
 @login_required
+@replica_reads
 def export_xlsx():
-    try:
-        import pandas as pd  # lazy import
-    except ImportError:
-        flash('Exportação XLSX indisponível: instale/repare pandas e numpy (pip install --upgrade pip setuptools wheel; pip install --force-reinstall numpy pandas openpyxl).', 'danger')
-        return redirect(url_for('main.index'))
+    from .xlsx import XlsxWriter  # só carregado por quem exporta
+    query, _ = TicketQuery.for_user(current_user, request.args).filtered()
+
+    writer = XlsxWriter()
+    writer.add_sheet('Chamados', EXPORT_HEADERS, export_rows(query))
+    writer.add_sheet('Métricas', ['Status', 'Quantidade'], status_metrics(query))
+    out = writer.close()
 
-    q = request.args.get('q', '')
-    status = request.args.get('status', '')
-    query = Ticket.query
-    if current_user.role != 'admin':
-        query = query.filter_by(created_by=current_user.id)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(or_(Ticket.title.ilike(like), Ticket.description.ilike(like), Ticket.vendor.ilike(like)))
-    if status:
-        query = query.filter_by(status=status)
-    tickets = query.order_by(Ticket.updated_at.desc()).all()
-
-    status_labels = {
-        'aberto': 'Aberto',
-        'pendente_totvs': 'Pendente TOTVS',
-        'pendente_feso': 'Pendente FESO',
-        'validacao_cliente': 'Validação Cliente',
-        'fechado': 'Fechado',
-    }
-
-    def fmt_dt(dt):
-        return dt.strftime('%d/%m/%Y %H:%M') if dt else ''
-
-    def fmt_td(td):
-        try:
-            total = int(td.total_seconds())
-        except Exception:
-            return ''
-        h, rem = divmod(total, 3600)
-        m, s = divmod(rem, 60)
-        return f"{h:02d}:{m:02d}:{s:02d}"
-
-    now = datetime.utcnow()
-    data = []
-    for t in tickets:
-        data.append({
-            'ID': t.id,
-            'Título': t.title,
-            'Status': status_labels.get(t.status, t.status),
-            'Prioridade': t.priority,
-            'Terceirizada': t.vendor or '',
-            'Responsável': t.assignee or '',
-            'Criado por': t.creator.email,
-            'Aberto há (HH:MM:SS)': fmt_td(now - (t.created_at or now)),
-            'Criado em': fmt_dt(t.created_at),
-            'Atualizado em': fmt_dt(t.updated_at),
-            'Última interação': fmt_dt(getattr(t, 'last_contact_at', None)),
-            'Alerta 24h': 'Sim' if getattr(t, 'is_stale_24h', False) else 'Não'
-        })
-
-    df = pd.DataFrame(data)
-    metrics = df.groupby('Status', as_index=False).size().rename(columns={'size': 'Quantidade'}) if not df.empty else pd.DataFrame(columns=['Status','Quantidade'])
-
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Chamados')
-        metrics.to_excel(writer, index=False, sheet_name='Métricas')
-        # Ajuste simples de largura
-        for sheet_name in writer.sheets:
-            ws = writer.sheets[sheet_name]
-            for col in ws.columns:
-                max_length = 12
-                column = col[0].column_letter
-                for cell in col:
-                    try:
-                        max_length = max(max_length, len(str(cell.value)))
-                    except Exception:
-                        pass
-                ws.column_dimensions[column].width = min(max_length + 2, 50)
-
-    bio.seek(0)
     ts = datetime.utcnow().strftime('%Y%m%d_%H%M')
     filename = f'chamados_{ts}.xlsx'
-    return send_file(bio, as_attachment=True, download_name=filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return send_file(out, as_attachment=True, download_name=filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+@main_bp.route('/admin/import', methods=['GET', 'POST'])
+@login_required
+def import_upload():
+    if current_user.role != 'admin':
+        flash('Sem permissão para importar', 'warning')
+        return redirect(url_for('main.index'))
+    form = ImportForm()
+    report = None
+    if form.validate_on_submit():
+        tickets_file, interactions_file = form.tickets.data, form.interactions.data
+        if not tickets_file and not interactions_file:
+            flash('Envie ao menos um arquivo', 'warning')
+        else:
+            tickets = interactions = None
+            if tickets_file:
+                tickets, interactions = open_tables(tickets_file.stream, tickets_file.filename)
+            if interactions_file:
+                interactions = open_interactions(interactions_file.stream, interactions_file.filename)
+            report = import_tables(tickets, interactions, current_user.id)
+            flash(report.summary(), 'success' if not report.errors else 'warning')
+    return render_template('import.html', form=form, report=report)
 
 
 @main_bp.route('/register', methods=['GET', 'POST'])
@@ -389,6 +398,8 @@ def reset_password(token):
 
 @main_bp.get('/auth/firebase/enabled')
 def auth_firebase_enabled():
+    # Chamado pela tela de login: já dispara a busca dos certificados do Google
+    get_token_verifier()
     return jsonify({'enabled': bool(os.getenv('FIREBASE_API_KEY'))})
 
 
@@ -399,26 +410,15 @@ def auth_firebase():
     if not id_token:
         return jsonify({'error': 'missing idToken'}), 400
 
-    email = name = None
-
-    # Preferir SDK Admin (se configurado)
+    verifier = get_token_verifier()
+    if verifier is None:
+        return jsonify({'error': 'firebase not configured'}), 503
     try:
-        import firebase_admin  # type: ignore
-        from firebase_admin import auth as fb_auth  # type: ignore
-        decoded = fb_auth.verify_id_token(id_token)
-        email = decoded.get('email')
-        name = decoded.get('name') or decoded.get('firebase', {}).get('sign_in_provider')
-    except Exception:
-        # Fallback para endpoint público
-        try:
-            resp = requests.get('https://oauth2.googleapis.com/tokeninfo', params={'id_token': id_token}, timeout=10)
-            info = resp.json()
-            # Validar audience (client id web)
-            if isinstance(info, dict) and info.get('aud') == os.getenv('FIREBASE_WEB_CLIENT_ID'):
-                email = info.get('email')
-                name = info.get('name')
-        except Exception:
-            pass
+        decoded = verifier.verify(id_token)
+    except InvalidIdToken:
+        return jsonify({'error': 'invalid token'}), 400
+    email = decoded.get('email')
+    name = decoded.get('name') or decoded.get('firebase', {}).get('sign_in_provider')
 
     if not email:
         return jsonify({'error': 'invalid token'}), 400
@@ -0,0 +1,228 @@
+"""Busca textual de chamados.
+
+Mantém a tabela `tickets_search` (título, descrição, terceirizada e o texto
+das interações de cada chamado) indexada com FULLTEXT no MySQL ou FTS5 no
+SQLite. Se a tabela não existir ou `SEARCH_BACKEND=like`, cai para o filtro
+ILIKE original (e volta a procurar a tabela a cada `BACKEND_RECHECK` segundos,
+para workers iniciados antes do `flask db upgrade`).
+"""
+import re
+import time
+from abc import ABC, abstractmethod
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Float, Integer, bindparam, event, inspect, or_, select, func, text
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import Ticket, Interaction
+from .pagination import Keyset
+
+SEARCH_TABLE = 'tickets_search'
+REBUILD_CHUNK = 2000
+BACKEND_RECHECK = 30  # segundos entre novas verificações enquanto a tabela não existe
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(q):
+    return _TOKEN_RE.findall(q or '')
+
+
+class LikeBackend:
+    name = 'like'
+
+    def apply(self, query, q):
+        like = f"%{q}%"
+        return query.filter(or_(Ticket.title.ilike(like), Ticket.description.ilike(like), Ticket.vendor.ilike(like))), None
+
+    def create(self, connection):
+        pass
+
+    def reindex(self, connection, ticket_ids):
+        pass
+
+
+class _FulltextBackend(LikeBackend, ABC):
+    match_sql = ''
+    delete_sql = ''
+    insert_sql = ''
+
+    @abstractmethod
+    def build_query(self, tokens):
+        """Expressão de busca do banco para `tokens`; vazia usa o ILIKE."""
+
+    def apply(self, query, q):
+        match = self.build_query(_tokens(q))
+        if not match:
+            return super().apply(query, q)
+        sub = (text(self.match_sql)
+               .bindparams(q=match)
+               .columns(ticket_id=Integer, score=Float)
+               .subquery('search'))
+        return query.join(sub, sub.c.ticket_id == Ticket.id), sub.c.score
+
+    def reindex(self, connection, ticket_ids):
+        ids = sorted({int(i) for i in ticket_ids if i is not None})
+        if not ids:
+            return
+        params = {'ids': ids}
+        connection.execute(text(self.delete_sql).bindparams(bindparam('ids', expanding=True)), params)
+        connection.execute(text(self.insert_sql).bindparams(bindparam('ids', expanding=True)), params)
+
+
+class Fts5Backend(_FulltextBackend):
+    name = 'fts5'
+    # Pesos do bm25 por coluna: título, descrição, terceirizada, interações
+    match_sql = (f"SELECT rowid AS ticket_id, -bm25({SEARCH_TABLE}, 10.0, 1.0, 2.0, 0.5) AS score "
+                 f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :q")
+    delete_sql = f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN :ids"
+    insert_sql = (f"INSERT INTO {SEARCH_TABLE}(rowid, title, description, vendor, interactions) "
+                  "SELECT t.id, t.title, coalesce(t.description, ''), coalesce(t.vendor, ''), "
+                  "coalesce((SELECT group_concat(i.content, ' ') FROM interactions i WHERE i.ticket_id = t.id), '') "
+                  "FROM tickets t WHERE t.id IN :ids")
+
+    def build_query(self, tokens):
+        # Cada termo vira um prefixo obrigatório: "manut"* "totvs"*
+        return ' '.join('"%s"*' % t for t in tokens)
+
+    def create(self, connection):
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "title, description, vendor, interactions, tokenize='unicode61 remove_diacritics 2')"
+        ))
+
+
+class MySQLFulltextBackend(_FulltextBackend):
+    name = 'mysql'
+    min_token = 3  # innodb_ft_min_token_size padrão
+    match_sql = (f"SELECT ticket_id, MATCH(title, description, vendor, interactions) AGAINST (:q IN BOOLEAN MODE) AS score "
+                 f"FROM {SEARCH_TABLE} WHERE MATCH(title, description, vendor, interactions) AGAINST (:q IN BOOLEAN MODE)")
+    delete_sql = f"DELETE FROM {SEARCH_TABLE} WHERE ticket_id IN :ids"
+    insert_sql = (f"INSERT INTO {SEARCH_TABLE}(ticket_id, title, description, vendor, interactions) "
+                  "SELECT t.id, t.title, coalesce(t.description, ''), coalesce(t.vendor, ''), "
+                  "coalesce((SELECT group_concat(i.content SEPARATOR ' ') FROM interactions i WHERE i.ticket_id = t.id), '') "
+                  "FROM tickets t WHERE t.id IN :ids")
+
+    def build_query(self, tokens):
+        # Termos menores que o token mínimo não são indexados; usar ILIKE nesse caso
+        if not tokens or any(len(t) < self.min_token for t in tokens):
+            return ''
+        return ' '.join(f'+{t}*' for t in tokens)
+
+    def create(self, connection):
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "ticket_id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(200), description MEDIUMTEXT, "
+            "vendor VARCHAR(120), interactions MEDIUMTEXT, "
+            "FULLTEXT KEY ft_tickets_search (title, description, vendor, interactions)"
+            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+        ))
+
+    def reindex(self, connection, ticket_ids):
+        # group_concat trunca em 1024 bytes por padrão
+        connection.execute(text("SET SESSION group_concat_max_len = 16777216"))
+        super().reindex(connection, ticket_ids)
+
+
+_FULLTEXT_BACKENDS = {'sqlite': Fts5Backend, 'mysql': MySQLFulltextBackend}
+_backends = {}  # url -> (backend, momento da verificação ou None se definitivo)
+
+
+def get_backend(bind):
+    """Backend de busca para o engine (ou conexão), cacheado por URL.
+
+    Com uma conexão, a verificação da tabela usa a própria conexão (no
+    SQLite, outra conexão esperaria o lock de escrita desta).
+    """
+    key = str(bind.engine.url)
+    backend, checked_at = _backends.get(key, (None, None))
+    if backend is not None and (checked_at is None or time.monotonic() - checked_at < BACKEND_RECHECK):
+        return backend
+    backend, checked_at = LikeBackend(), None
+    if current_app.config.get('SEARCH_BACKEND', 'auto') != 'like':
+        cls = _FULLTEXT_BACKENDS.get(bind.dialect.name)
+        if cls and inspect(bind).has_table(SEARCH_TABLE):
+            backend = cls()
+        elif cls:
+            checked_at = time.monotonic()  # tabela ainda não criada: verificar de novo depois
+    _backends[key] = (backend, checked_at)
+    return backend
+
+
+def reset_backend_cache():
+    _backends.clear()
+
+
+def apply_search(query, q):
+    """Filtra `query` pelo termo `q`; retorna (query, expressão de relevância ou None)."""
+    return get_backend(db.session.get_bind()).apply(query, q)
+
+
+def relevance_keyset(score):
+    # Linhas são (Ticket, score); desempate por id
+    return Keyset(
+        columns=(score, Ticket.id),
+        values=lambda row: (row[1], row[0].id),
+        types=(float, int),
+        item=lambda row: row[0],
+    )
+
+
+def rebuild(connection, backend, chunk=REBUILD_CHUNK):
+    backend.create(connection)
+    max_id = connection.execute(select(func.max(Ticket.id))).scalar() or 0
+    for start in range(0, max_id, chunk):
+        backend.reindex(connection, range(start + 1, start + chunk + 1))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_search_changes(session, flush_context):
+    pending = session.info.setdefault('search_reindex', set())
+    for obj in session.new:
+        if isinstance(obj, (Ticket, Interaction)):
+            pending.add(obj.id if isinstance(obj, Ticket) else obj.ticket_id)
+    for obj in session.dirty:
+        if isinstance(obj, Ticket):
+            attrs = inspect(obj).attrs
+            if any(attrs[a].history.has_changes() for a in ('title', 'description', 'vendor')):
+                pending.add(obj.id)
+        elif isinstance(obj, Interaction):
+            attrs = inspect(obj).attrs
+            if attrs.content.history.has_changes() or attrs.ticket_id.history.has_changes():
+                pending.add(obj.ticket_id)
+                pending.update(attrs.ticket_id.history.deleted or ())
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            pending.add(obj.id)
+        elif isinstance(obj, Interaction):
+            pending.add(obj.ticket_id)
+    pending.discard(None)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_search_changes(session, flush_context):
+    pending = session.info.pop('search_reindex', None)
+    if not pending:
+        return
+    connection = session.connection()
+    get_backend(connection).reindex(connection, pending)
+
+
+search_cli = AppGroup('search', help='Índice de busca textual dos chamados.')
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Cria (se preciso) e repopula o índice de busca."""
+    engine = db.engine
+    cls = _FULLTEXT_BACKENDS.get(engine.dialect.name)
+    if cls is None:
+        raise click.ClickException(f'Sem busca textual para o banco {engine.dialect.name}')
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        rebuild(connection, cls())
+    reset_backend_cache()
+    click.echo(f'Índice {SEARCH_TABLE} reconstruído em {time.perf_counter() - started:.1f}s')
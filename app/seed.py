@@ -0,0 +1,177 @@
+"""Dados sintéticos para medir o app em tamanhos realistas.
+
+`flask seed --users 500 --tickets 200000 --interactions-per-ticket 0-50`
+insere em lotes via Core (executemany), sem passar pelo ORM, e depois
+recalcula o que os eventos de sessão manteriam: colunas de último contato,
+índice de busca e ticket_stats. Os dados são acrescentados aos existentes.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+
+from .extensions import db
+from .models import Interaction, Ticket, User, refresh_contact_columns
+from .queries import invalidate_tickets
+from .search import get_backend
+from .vendors import VendorResolver
+from . import stats
+
+SEED_BATCH = 5000
+DEFAULT_PASSWORD = 'senha123'
+
+STATUSES = (('aberto', 40), ('em_andamento', 25), ('resolvido', 15), ('fechado', 20))
+PRIORITIES = (('baixa', 30), ('media', 45), ('alta', 20), ('critica', 5))
+VENDORS = ('TOTVS', 'Senior', 'Microsoft', 'Dell', 'Oracle', 'Linx', 'Sankhya', None)
+ASSIGNEES = ('Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', None)
+WORDS = ('nota fiscal erro integração faturamento estoque relatório acesso senha servidor '
+         'lentidão impressora backup contrato boleto cadastro cliente fornecedor pedido '
+         'manutenção atualização versão banco dados rede firewall licença usuário sistema '
+         'chamado retorno prazo ajuste falha tela módulo pagamento').split()
+
+
+def parse_range(text):
+    """'0-50' -> (0, 50); '10' -> (10, 10)."""
+    lo, _, hi = str(text).partition('-')
+    lo, hi = int(lo), int(hi or lo)
+    if lo < 0 or hi < lo:
+        raise ValueError(f'intervalo inválido: {text}')
+    return lo, hi
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _sentence(rng, n):
+    return ' '.join(rng.choices(WORDS, k=n))
+
+
+def _next_id(connection, model):
+    return (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def seed(connection, search_backend, users=500, tickets=200_000, interactions=(0, 50), days=365,
+         password=DEFAULT_PASSWORD, rng=None, batch=SEED_BATCH, now=None, progress=None):
+    """Insere usuários, chamados e interações; retorna as contagens.
+
+    `search_backend` vem de `search.get_backend(db.engine)`, obtido antes de
+    abrir a transação (no SQLite a inspeção usa outra conexão e ficaria bloqueada).
+    """
+    rng = rng or random.Random()
+    now = now or datetime.utcnow()
+    start = now - timedelta(days=days)
+    password_hash = generate_password_hash(password)  # um hash para todos: scrypt é lento
+
+    first_user = _next_id(connection, User)
+    user_rows = [{
+        'id': first_user + i,
+        'name': f'Usuário {first_user + i}',
+        'email': f'seed{first_user + i}@example.com',
+        'password_hash': password_hash,
+        'role': 'admin' if i % 50 == 0 else 'user',
+        'is_active': True,
+        'created_at': start,
+    } for i in range(users)]
+    for i in range(0, len(user_rows), batch):
+        connection.execute(User.__table__.insert(), user_rows[i:i + batch])
+    user_ids = [u['id'] for u in user_rows] or [
+        row[0] for row in connection.execute(select(User.id))]
+    if not user_ids:
+        raise ValueError('sem usuários para criar chamados (use --users > 0)')
+    names = {u['id']: u['name'] for u in user_rows}
+    vendors = VendorResolver(connection)
+
+    first_ticket = _next_id(connection, Ticket)
+    span = (now - start).total_seconds()
+    counts = {'users': users, 'tickets': 0, 'interactions': 0}
+    ticket_rows, inter_rows = [], []
+
+    def flush():
+        for row in ticket_rows:
+            row['vendor_id'] = vendors.ensure(row['vendor'])
+        for row in inter_rows:
+            row['vendor_id'] = vendors.match(row['author'])
+        if ticket_rows:
+            connection.execute(Ticket.__table__.insert(), ticket_rows)
+        if inter_rows:
+            connection.execute(Interaction.__table__.insert(), inter_rows)
+        refresh_contact_columns(connection, [t['id'] for t in ticket_rows])
+        counts['tickets'] += len(ticket_rows)
+        counts['interactions'] += len(inter_rows)
+        ticket_rows.clear()
+        inter_rows.clear()
+        if progress:
+            progress(counts)
+
+    for ticket_id in range(first_ticket, first_ticket + tickets):
+        created = start + timedelta(seconds=rng.random() * span)
+        vendor = rng.choice(VENDORS)
+        creator = rng.choice(user_ids)
+        n = rng.randint(*interactions)
+        stamps = sorted(created + timedelta(seconds=rng.random() * (now - created).total_seconds()) for _ in range(n))
+        for ts in stamps:
+            by_vendor = vendor and rng.random() < 0.5
+            inter_rows.append({
+                'ticket_id': ticket_id,
+                'content': _sentence(rng, rng.randint(5, 40)),
+                'author': f'Suporte {vendor}' if by_vendor else names.get(creator, 'Usuário'),
+                'created_at': ts,
+            })
+        ticket_rows.append({
+            'id': ticket_id,
+            'title': _sentence(rng, rng.randint(3, 8)).capitalize(),
+            'description': _sentence(rng, rng.randint(10, 80)),
+            'status': _weighted(rng, STATUSES),
+            'priority': _weighted(rng, PRIORITIES),
+            'vendor': vendor,
+            'assignee': rng.choice(ASSIGNEES),
+            'created_by': creator,
+            'created_at': created,
+            'updated_at': stamps[-1] if stamps else created,
+            'last_contact_at': created,
+        })
+        if len(ticket_rows) >= batch or len(inter_rows) >= batch * 10:
+            flush()
+    flush()
+
+    # Derivados que os eventos de sessão manteriam numa escrita pelo ORM
+    for i in range(first_ticket, first_ticket + tickets, batch):
+        search_backend.reindex(connection, range(i, min(i + batch, first_ticket + tickets)))
+    stats.rebuild(connection)
+    return counts
+
+
+@click.command('seed')
+@click.option('--users', default=500, show_default=True)
+@click.option('--tickets', default=200_000, show_default=True)
+@click.option('--interactions-per-ticket', 'interactions', default='0-50', show_default=True,
+              help='Intervalo (mín-máx) de interações por chamado.')
+@click.option('--days', default=365, show_default=True, help='Chamados criados nos últimos N dias.')
+@click.option('--password', default=DEFAULT_PASSWORD, show_default=True, help='Senha dos usuários criados.')
+@click.option('--seed', 'random_seed', type=int, default=None, help='Semente para dados reproduzíveis.')
+@click.option('--batch', default=SEED_BATCH, show_default=True, help='Linhas por executemany.')
+@with_appcontext
+def seed_command(users, tickets, interactions, days, password, random_seed, batch):
+    """Gera usuários, chamados e interações sintéticos."""
+    try:
+        interactions = parse_range(interactions)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint='--interactions-per-ticket')
+    started = time.perf_counter()
+
+    def progress(counts):
+        click.echo(f"\r{counts['tickets']}/{tickets} chamados, {counts['interactions']} interações", nl=False)
+
+    backend = get_backend(db.engine)
+    with db.engine.begin() as connection:
+        counts = seed(connection, backend, users, tickets, interactions, days, password,
+                      random.Random(random_seed), batch, progress=progress)
+    invalidate_tickets()
+    click.echo(f"\n{counts['users']} usuários, {counts['tickets']} chamados e "
+               f"{counts['interactions']} interações em {time.perf_counter() - started:.1f}s")
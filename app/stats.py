@@ -0,0 +1,125 @@
+"""Contadores agregados de chamados (tabela `ticket_stats`).
+
+Cada flush que cria, altera ou exclui chamados gera deltas por dimensão
+(+1 no valor novo, -1 no antigo), aplicados com upsert na mesma transação.
+Leitura é O(número de valores distintos), sem varrer `tickets`.
+`flask stats rebuild` recalcula tudo com GROUP BY (ex.: após cargas via Core).
+"""
+from collections import Counter
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import Ticket, TicketStat
+
+DIMENSIONS = ('status', 'priority', 'vendor', 'assignee')
+
+
+def _key(value):
+    return (value or '')[:120]
+
+
+def apply_deltas(connection, deltas):
+    """Soma `deltas` ({(dimensão, valor): n}) em ticket_stats com upsert."""
+    table = TicketStat.__table__
+    rows = [{'dimension': d, 'value': v, 'count': n} for (d, v), n in deltas.items() if n]
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=['dimension', 'value'],
+                                          set_={'count': table.c.count + stmt.excluded.count})
+        connection.execute(stmt, rows)
+    elif dialect == 'mysql':
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted.count)
+        connection.execute(stmt, rows)
+    else:
+        for row in rows:
+            res = connection.execute(
+                update(table)
+                .where(table.c.dimension == row['dimension'], table.c.value == row['value'])
+                .values(count=table.c.count + row['count'])
+            )
+            if not res.rowcount:
+                connection.execute(table.insert().values(**row))
+
+
+def row_deltas(rows):
+    """+1 por dimensão para cada chamado (dict com as colunas) inserido via Core."""
+    deltas = Counter()
+    for row in rows:
+        for dim in DIMENSIONS:
+            deltas[(dim, _key(row.get(dim)))] += 1
+    return deltas
+
+
+def rebuild(connection):
+    table = TicketStat.__table__
+    tickets = Ticket.__table__
+    connection.execute(table.delete())
+    for dim in DIMENSIONS:
+        col = tickets.c[dim]
+        counts = connection.execute(select(col, func.count()).group_by(col)).all()
+        merged = Counter()
+        for value, n in counts:
+            merged[(dim, _key(value))] += n
+        apply_deltas(connection, merged)
+
+
+def get_stats():
+    """{'status': {'aberto': 10, ...}, 'priority': {...}, ...}"""
+    result = {dim: {} for dim in DIMENSIONS}
+    for stat in TicketStat.query.filter(TicketStat.count > 0):
+        result.setdefault(stat.dimension, {})[stat.value] = stat.count
+    return result
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_stat_deltas(session, flush_context):
+    deltas = session.info.setdefault('stat_deltas', Counter())
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            for dim in DIMENSIONS:
+                deltas[(dim, _key(getattr(obj, dim)))] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Ticket):
+            attrs = inspect(obj).attrs
+            for dim in DIMENSIONS:
+                hist = attrs[dim].history
+                if hist.has_changes():
+                    for old in hist.deleted or ():
+                        deltas[(dim, _key(old))] -= 1
+                    deltas[(dim, _key(getattr(obj, dim)))] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            attrs = inspect(obj).attrs
+            for dim in DIMENSIONS:
+                hist = attrs[dim].history
+                # Valor do banco, mesmo que alterado na sessão antes do delete
+                old = (hist.deleted or hist.unchanged or [getattr(obj, dim)])[0]
+                deltas[(dim, _key(old))] -= 1
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_stat_deltas(session, flush_context):
+    deltas = session.info.pop('stat_deltas', None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+stats_cli = AppGroup('stats', help='Contadores agregados de chamados.')
+
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Recalcula ticket_stats a partir de tickets."""
+    with db.engine.begin() as connection:
+        rebuild(connection)
+    click.echo('ticket_stats recalculada')
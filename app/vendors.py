@@ -0,0 +1,200 @@
+"""Terceirizadas (tabela `vendors`) e apelidos (`vendor_aliases`).
+
+`Ticket.vendor` continua sendo o texto digitado; `Ticket.vendor_id` aponta
+para a terceirizada de mesmo nome ou apelido (criada se não existir). Cada
+interação recebe na escrita o `vendor_id` cujo nome/apelido aparece no
+autor, e o último contato da terceirizada vira uma busca no índice
+(ticket_id, vendor_id, created_at) em vez de comparar textos.
+Escritas via Core (importação, seed, ações em massa) usam `VendorResolver`.
+"""
+import time
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, event, func, inspect, select, union_all, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .extensions import db
+from .models import Interaction, Ticket, Vendor, VendorAlias, refresh_contact_columns
+
+RESOLVE_CHUNK = 2000
+
+
+def vendor_key(text):
+    """Forma normalizada usada para comparar nomes: minúsculas e espaços simples."""
+    return ' '.join((text or '').split()).lower()[:120]
+
+
+class VendorResolver:
+    """Nomes e apelidos carregados uma vez (a tabela é pequena) para resolver muitas linhas."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        names = union_all(select(Vendor.key, Vendor.id), select(VendorAlias.key, VendorAlias.vendor_id))
+        self.ids = dict(connection.execute(names).all())
+        self._by_length = None
+
+    def ensure(self, name):
+        """id da terceirizada chamada `name` (nome ou apelido), criando-a se preciso."""
+        key = vendor_key(name)
+        if not key:
+            return None
+        if key not in self.ids:
+            table = Vendor.__table__
+            values = {'name': ' '.join(name.split())[:120], 'key': key, 'created_at': func.now()}
+            dialect = self.connection.dialect.name
+            # Outro processo pode criar a mesma ao mesmo tempo: inserir ignorando conflito e reler
+            if dialect == 'sqlite':
+                stmt = sqlite_insert(table).values(values).on_conflict_do_nothing(index_elements=['key'])
+            elif dialect == 'mysql':
+                stmt = mysql_insert(table).values(values).prefix_with('IGNORE')
+            else:
+                stmt = table.insert().values(values)
+            self.connection.execute(stmt)
+            self.ids[key] = self.connection.execute(select(Vendor.id).where(Vendor.key == key)).scalar_one()
+            self._by_length = None
+        return self.ids[key]
+
+    def match(self, author):
+        """id da terceirizada cujo nome/apelido aparece em `author` (o mais longo vence), ou None."""
+        key = vendor_key(author)
+        if not key:
+            return None
+        if key in self.ids:
+            return self.ids[key]
+        if self._by_length is None:
+            self._by_length = sorted(self.ids.items(), key=lambda kv: len(kv[0]), reverse=True)
+        for name, vendor_id in self._by_length:
+            if name in key:
+                return vendor_id
+        return None
+
+
+def _written(target, attr):
+    """Objeto novo ou com `attr` alterado neste flush."""
+    state = inspect(target)
+    return state.key is None or state.attrs[attr].history.has_changes()
+
+
+@event.listens_for(Ticket, 'before_insert')
+@event.listens_for(Ticket, 'before_update')
+def _ticket_vendor_id(mapper, connection, target):
+    if _written(target, 'vendor'):
+        target.vendor_id = VendorResolver(connection).ensure(target.vendor) if vendor_key(target.vendor) else None
+
+
+@event.listens_for(Interaction, 'before_insert')
+@event.listens_for(Interaction, 'before_update')
+def _interaction_vendor_id(mapper, connection, target):
+    if _written(target, 'author'):
+        target.vendor_id = VendorResolver(connection).match(target.author)
+
+
+def _resolve_table(connection, model, source, resolve, chunk, progress):
+    """Grava o vendor_id recalculado onde mudou; retorna os ids de chamados afetados."""
+    table = model.__table__
+    ticket_col = table.c.id if model is Ticket else table.c.ticket_id
+    set_vendor = update(table).where(table.c.id == bindparam('_id')).values(vendor_id=bindparam('_vendor_id'))
+    affected = set()
+    max_id = connection.execute(select(func.max(table.c.id))).scalar() or 0
+    for start in range(0, max_id, chunk):
+        rows = connection.execute(select(table.c.id, source, table.c.vendor_id, ticket_col)
+                                  .where(table.c.id > start, table.c.id <= start + chunk)).all()
+        updates = []
+        for row_id, text, current, ticket_id in rows:
+            vendor_id = resolve(text)
+            if vendor_id != current:
+                updates.append({'_id': row_id, '_vendor_id': vendor_id})
+                affected.add(ticket_id)
+        if updates:
+            connection.execute(set_vendor, updates)
+        if progress:
+            progress(table.name, min(start + chunk, max_id), max_id)
+    return affected
+
+
+def resolve_all(connection, chunk=RESOLVE_CHUNK, progress=None):
+    """Recalcula vendor_id de chamados e interações (após criar apelidos ou cargas antigas).
+
+    Percorre por faixas de id, grava só o que mudou e recalcula o último
+    contato dos chamados afetados; retorna os ids desses chamados.
+    """
+    resolver = VendorResolver(connection)
+    affected = _resolve_table(connection, Ticket, Ticket.__table__.c.vendor, resolver.ensure, chunk, progress)
+    affected |= _resolve_table(connection, Interaction, Interaction.__table__.c.author, resolver.match, chunk, progress)
+    _refresh(connection, affected, chunk)
+    return affected
+
+
+def _refresh(connection, ticket_ids, chunk=RESOLVE_CHUNK):
+    ids = sorted(ticket_ids)
+    for i in range(0, len(ids), chunk):
+        refresh_contact_columns(connection, ids[i:i + chunk])
+
+
+vendors_cli = AppGroup('vendors', help='Terceirizadas e apelidos.')
+
+
+@vendors_cli.command('list')
+def list_command():
+    """Lista terceirizadas com apelidos e quantidade de chamados."""
+    counts = dict(db.session.execute(select(Ticket.vendor_id, func.count()).group_by(Ticket.vendor_id)).all())
+    for vendor in Vendor.query.order_by(Vendor.name):
+        aliases = ', '.join(sorted(a.key for a in vendor.aliases))
+        click.echo(f'{vendor.id}\t{vendor.name}\t{counts.get(vendor.id, 0)} chamado(s)' + (f'\t[{aliases}]' if aliases else ''))
+
+
+def merge(connection, source_id, target_id):
+    """Funde a terceirizada `source_id` em `target_id`: o nome dela vira apelido da outra.
+
+    Retorna os ids dos chamados com o último contato da terceirizada recalculado.
+    """
+    source_key = connection.execute(select(Vendor.key).where(Vendor.id == source_id)).scalar_one()
+    affected = set(connection.execute(union_all(
+        select(Ticket.id).where(Ticket.vendor_id == source_id),
+        select(Interaction.ticket_id).where(Interaction.vendor_id == source_id))).scalars())
+    for table in (Ticket.__table__, Interaction.__table__):
+        connection.execute(update(table).where(table.c.vendor_id == source_id).values(vendor_id=target_id))
+    aliases = VendorAlias.__table__
+    connection.execute(update(aliases).where(aliases.c.vendor_id == source_id).values(vendor_id=target_id))
+    connection.execute(Vendor.__table__.delete().where(Vendor.id == source_id))
+    connection.execute(aliases.insert().values(vendor_id=target_id, key=source_key))
+    _refresh(connection, affected)
+    return affected
+
+
+@vendors_cli.command('alias')
+@click.argument('vendor')
+@click.argument('aliases', nargs=-1, required=True)
+def alias_command(vendor, aliases):
+    """Registra APELIDOS da terceirizada VENDOR (criada se não existir) e reatribui os registros.
+
+    Um apelido que já é outra terceirizada (criada a partir de outra grafia) é fundido em VENDOR.
+    """
+    started = time.perf_counter()
+    with db.engine.begin() as connection:
+        resolver = VendorResolver(connection)
+        vendor_id = resolver.ensure(vendor)
+        merged, tickets = set(), set()
+        for alias in aliases:
+            key = vendor_key(alias)
+            owner = resolver.ids.get(key)
+            if owner is None:
+                connection.execute(VendorAlias.__table__.insert().values(vendor_id=vendor_id, key=key))
+            elif owner != vendor_id and owner not in merged:
+                tickets |= merge(connection, owner, vendor_id)
+                merged.add(owner)
+        tickets |= resolve_all(connection)
+    click.echo(f'{len(aliases)} apelido(s) para {vendor} ({len(merged)} terceirizada(s) fundida(s)); '
+               f'{len(tickets)} chamado(s) reatribuídos em {time.perf_counter() - started:.1f}s')
+
+
+@vendors_cli.command('resolve')
+@click.option('--chunk', default=RESOLVE_CHUNK, show_default=True, help='Linhas por faixa de id.')
+def resolve_command(chunk):
+    """Recalcula vendor_id de chamados e interações e o último contato da terceirizada."""
+    started = time.perf_counter()
+    with db.engine.begin() as connection:
+        tickets = resolve_all(connection, chunk)
+    click.echo(f'{len(tickets)} chamado(s) com terceirizada reatribuída em {time.perf_counter() - started:.1f}s')
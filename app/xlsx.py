@@ -0,0 +1,248 @@
+"""Escritor e leitor XLSX mínimos e em streaming (sem pandas/openpyxl).
+
+As linhas de cada planilha vão direto para um arquivo temporário enquanto as
+larguras das colunas são calculadas; no fechamento o XML é montado no zip
+copiando esse arquivo, então a memória não cresce com o número de linhas.
+A leitura percorre o XML da planilha com iterparse, uma linha por vez.
+"""
+import re
+import shutil
+import zipfile
+from tempfile import SpooledTemporaryFile
+from xml.etree.ElementTree import fromstring, iterparse
+from xml.sax.saxutils import escape
+
+SPOOL_MAX = 8 * 1024 * 1024  # acima disso os temporários vão para disco
+MIN_WIDTH, MAX_WIDTH = 12, 50
+
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+# Estilo 0 = padrão, 1 = cabeçalho em negrito
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+
+
+def column_letter(idx: int) -> str:
+    """0 -> A, 25 -> Z, 26 -> AA."""
+    letters = ''
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell(ref, value, style=0):
+    s = f' s="{style}"' if style else ''
+    if isinstance(value, bool) or value is None:
+        value = '' if value is None else str(value)
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{s}><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class _Sheet:
+    def __init__(self, name):
+        self.name = name
+        self.data = SpooledTemporaryFile(max_size=SPOOL_MAX, mode='w+b')
+        self.widths = []
+        self.rows = 0
+
+    def append(self, values, style=0):
+        self.rows += 1
+        n = self.rows
+        parts = [f'<row r="{n}">']
+        for idx, value in enumerate(values):
+            if idx >= len(self.widths):
+                self.widths.append(MIN_WIDTH)
+            length = len(str(value)) if value is not None else 0
+            if length > self.widths[idx]:
+                self.widths[idx] = length
+            parts.append(_cell(f'{column_letter(idx)}{n}', value, style))
+        parts.append('</row>')
+        self.data.write(''.join(parts).encode('utf-8'))
+
+    def write_to(self, zf, path):
+        cols = ''.join(
+            f'<col min="{i}" max="{i}" width="{min(w + 2, MAX_WIDTH)}" customWidth="1"/>'
+            for i, w in enumerate(self.widths, 1)
+        )
+        head = f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet {_SHEET_NS}>'
+        if cols:
+            head += f'<cols>{cols}</cols>'
+        with zf.open(path, 'w', force_zip64=True) as out:
+            out.write((head + '<sheetData>').encode('utf-8'))
+            self.data.seek(0)
+            shutil.copyfileobj(self.data, out)
+            out.write(b'</sheetData></worksheet>')
+        self.data.close()
+
+
+class XlsxWriter:
+    """Uso: w = XlsxWriter(); w.add_sheet('Nome', cabeçalho, linhas); arquivo = w.close()."""
+
+    def __init__(self):
+        self.sheets = []
+
+    def add_sheet(self, name, headers, rows):
+        sheet = _Sheet(name[:31])
+        sheet.append(headers, style=1)
+        for row in rows:
+            sheet.append(row)
+        self.sheets.append(sheet)
+        return sheet
+
+    def close(self):
+        """Monta o .xlsx num arquivo temporário posicionado no início."""
+        out = SpooledTemporaryFile(max_size=SPOOL_MAX, mode='w+b')
+        with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            overrides = ''.join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in range(1, len(self.sheets) + 1)
+            )
+            zf.writestr('[Content_Types].xml', _CONTENT_TYPES_HEAD + overrides + '</Types>')
+            zf.writestr('_rels/.rels', _ROOT_RELS)
+            zf.writestr('xl/styles.xml', _STYLES)
+            sheets = ''.join(
+                f'<sheet name="{escape(s.name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+                for i, s in enumerate(self.sheets, 1)
+            )
+            zf.writestr('xl/workbook.xml', (
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<workbook {_SHEET_NS} xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                f'<sheets>{sheets}</sheets></workbook>'
+            ))
+            rels = ''.join(
+                f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i}.xml"/>'
+                for i in range(1, len(self.sheets) + 1)
+            )
+            styles_id = len(self.sheets) + 1
+            rels += (f'<Relationship Id="rId{styles_id}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+                     'Target="styles.xml"/>')
+            zf.writestr('xl/_rels/workbook.xml.rels', (
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>'
+            ))
+            for i, sheet in enumerate(self.sheets, 1):
+                sheet.write_to(zf, f'xl/worksheets/sheet{i}.xml')
+        out.seek(0)
+        return out
+
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_DOC_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_REF_LETTERS = re.compile(r'[A-Z]+')
+
+
+def column_index(letters: str) -> int:
+    """A -> 0, Z -> 25, AA -> 26."""
+    idx = 0
+    for ch in letters:
+        idx = idx * 26 + ord(ch) - 64
+    return idx - 1
+
+
+def _text(elem):
+    # <si>/<is> podem ter vários trechos <r><t> (rich text)
+    return ''.join(t.text or '' for t in elem.iter(f'{_NS}t'))
+
+
+class XlsxReader:
+    """Uso: r = XlsxReader(arquivo); for valores in r.rows('Chamados'): ...
+
+    Células numéricas voltam como int/float (datas ficam como número serial
+    do Excel), booleanas como bool e o resto como str; células vazias como None.
+    """
+
+    def __init__(self, file):
+        self.zip = zipfile.ZipFile(file)
+        self._strings = None
+        self.sheets = self._sheet_paths()
+
+    def _sheet_paths(self):
+        workbook = fromstring(self.zip.read('xl/workbook.xml'))
+        rels = fromstring(self.zip.read('xl/_rels/workbook.xml.rels'))
+        targets = {r.get('Id'): r.get('Target') for r in rels}
+        paths = {}
+        for sheet in workbook.iter(f'{_NS}sheet'):
+            target = targets[sheet.get(f'{_DOC_REL_NS}id')]
+            paths[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+        return paths
+
+    @property
+    def shared_strings(self):
+        if self._strings is None:
+            self._strings = []
+            if 'xl/sharedStrings.xml' in self.zip.namelist():
+                with self.zip.open('xl/sharedStrings.xml') as fh:
+                    for _, elem in iterparse(fh):
+                        if elem.tag == f'{_NS}si':
+                            self._strings.append(_text(elem))
+                            elem.clear()
+        return self._strings
+
+    def _value(self, cell):
+        kind = cell.get('t')
+        if kind == 'inlineStr':
+            return _text(cell)
+        v = cell.find(f'{_NS}v')
+        if v is None or v.text is None:
+            return None
+        if kind == 's':
+            return self.shared_strings[int(v.text)]
+        if kind == 'b':
+            return v.text == '1'
+        if kind in ('str', 'e'):
+            return v.text
+        number = float(v.text)
+        return int(number) if number.is_integer() else number
+
+    def rows(self, sheet=None):
+        """Linhas da planilha `sheet` (padrão: a primeira) como listas de valores."""
+        name = sheet if sheet is not None else next(iter(self.sheets))
+        with self.zip.open(self.sheets[name]) as fh:
+            parent = None
+            for event, elem in iterparse(fh, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == f'{_NS}sheetData':
+                        parent = elem
+                    continue
+                if elem.tag != f'{_NS}row':
+                    continue
+                values = []
+                for cell in elem.iter(f'{_NS}c'):
+                    ref = cell.get('r')
+                    idx = column_index(_REF_LETTERS.match(ref).group()) if ref else len(values)
+                    values.extend([None] * (idx - len(values)))
+                    values.append(self._value(cell))
+                yield values
+                if parent is not None:
+                    parent.clear()  # libera as linhas já lidas
@@ -0,0 +1,14 @@
+"""Configuração do gunicorn (lida automaticamente quando ele roda na raiz do projeto).
+
+`gunicorn wsgi:app`. Os streams de `/events` (app/changes.py) ficam abertos
+por até SSE_MAX_SECONDS e cada um ocupa uma thread: com o worker síncrono
+padrão, poucas abas esgotariam os workers. Por isso o worker é `gthread`.
+Sem threads (ou gevent) o `/events` deixa de segurar a conexão e o navegador
+reconecta a cada SSE_SYNC_RETRY_SECONDS.
+"""
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+# Streams SSE abertos por worker + requisições normais
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
@@ -0,0 +1,33 @@
+"""stale digests
+
+Revision ID: 1b6e0f8a2d93
+Revises: f2a9d41c6e38
+Create Date: 2026-10-18 13:31:57.882104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b6e0f8a2d93'
+down_revision = 'f2a9d41c6e38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stale_digests',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('window_start', sa.DateTime(), nullable=False),
+    sa.Column('ticket_ids', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'window_start', name='uq_stale_digests_user_window')
+    )
+
+
+def downgrade():
+    op.drop_table('stale_digests')
@@ -0,0 +1,29 @@
+"""ticket changes created_by index
+
+Revision ID: 3c7e5a9f1d42
+Revises: f0b6c3d8e271
+Create Date: 2026-10-18 21:12:40.318207
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7e5a9f1d42'
+down_revision = 'f0b6c3d8e271'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Interações eram gravadas sem o criador do chamado
+    op.execute('UPDATE ticket_changes SET created_by = '
+               '(SELECT tickets.created_by FROM tickets WHERE tickets.id = ticket_changes.ticket_id) '
+               'WHERE created_by IS NULL')
+    with op.batch_alter_table('ticket_changes', schema=None) as batch_op:
+        batch_op.create_index('ix_ticket_changes_created_by_seq', ['created_by', 'seq'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket_changes', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_changes_created_by_seq')
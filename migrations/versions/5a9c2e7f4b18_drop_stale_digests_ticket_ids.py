@@ -0,0 +1,26 @@
+"""drop stale digests ticket_ids
+
+Revision ID: 5a9c2e7f4b18
+Revises: c6f1a8e3b290
+Create Date: 2026-10-18 22:31:09.447815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9c2e7f4b18'
+down_revision = 'c6f1a8e3b290'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('stale_digests', schema=None) as batch_op:
+        batch_op.drop_column('ticket_ids')
+
+
+def downgrade():
+    with op.batch_alter_table('stale_digests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ticket_ids', sa.Text(), nullable=False, server_default=''))
@@ -0,0 +1,36 @@
+"""ticket stats
+
+Revision ID: 7d3c92e5a1f0
+Revises: 1b6e0f8a2d93
+Create Date: 2026-10-18 14:22:10.640731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3c92e5a1f0'
+down_revision = '1b6e0f8a2d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_stats',
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('value', sa.String(length=120), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'value')
+    )
+    # Carga inicial a partir dos chamados existentes
+    for dim in ('status', 'priority', 'vendor', 'assignee'):
+        op.execute(
+            f"INSERT INTO ticket_stats (dimension, value, count) "
+            f"SELECT '{dim}', coalesce(substr({dim}, 1, 120), ''), count(*) FROM tickets "
+            f"GROUP BY coalesce(substr({dim}, 1, 120), '')"
+        )
+
+
+def downgrade():
+    op.drop_table('ticket_stats')
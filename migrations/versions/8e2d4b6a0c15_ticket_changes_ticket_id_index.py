@@ -0,0 +1,25 @@
+"""ticket changes ticket_id index
+
+Revision ID: 8e2d4b6a0c15
+Revises: 3c7e5a9f1d42
+Create Date: 2026-10-18 21:40:02.904551
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2d4b6a0c15'
+down_revision = '3c7e5a9f1d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ticket_changes', schema=None) as batch_op:
+        batch_op.create_index('ix_ticket_changes_ticket_id_seq', ['ticket_id', 'seq'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket_changes', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_changes_ticket_id_seq')
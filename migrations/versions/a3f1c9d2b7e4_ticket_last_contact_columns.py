@@ -0,0 +1,71 @@
+"""ticket last contact columns
+
+Revision ID: a3f1c9d2b7e4
+Revises: 458c1a71f423
+Create Date: 2026-10-18 09:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2b7e4'
+down_revision = '458c1a71f423'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK = 1000
+
+tickets = sa.table(
+    'tickets',
+    sa.column('id', sa.Integer),
+    sa.column('vendor', sa.String),
+    sa.column('created_at', sa.DateTime),
+    sa.column('last_contact_at', sa.DateTime),
+    sa.column('last_vendor_contact_at', sa.DateTime),
+)
+interactions = sa.table(
+    'interactions',
+    sa.column('ticket_id', sa.Integer),
+    sa.column('author', sa.String),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_contact_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_vendor_contact_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_tickets_last_contact_at'), ['last_contact_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_tickets_last_vendor_contact_at'), ['last_vendor_contact_at'], unique=False)
+
+    # Backfill em blocos de ids para não segurar locks longos
+    bind = op.get_bind()
+    vendor_key = sa.func.lower(sa.func.trim(tickets.c.vendor))
+    last_any = (sa.select(sa.func.max(interactions.c.created_at))
+                .where(interactions.c.ticket_id == tickets.c.id)
+                .scalar_subquery())
+    last_vendor = (sa.select(sa.func.max(interactions.c.created_at))
+                   .where(interactions.c.ticket_id == tickets.c.id,
+                          sa.func.lower(interactions.c.author).contains(vendor_key))
+                   .scalar_subquery())
+    max_id = bind.execute(sa.select(sa.func.max(tickets.c.id))).scalar() or 0
+    start = 0
+    while start < max_id:
+        end = start + BACKFILL_CHUNK
+        bind.execute(
+            tickets.update()
+            .where(tickets.c.id > start, tickets.c.id <= end)
+            .values(last_contact_at=sa.func.coalesce(last_any, tickets.c.created_at),
+                    last_vendor_contact_at=sa.case((vendor_key == '', None), else_=last_vendor))
+        )
+        start = end
+
+
+def downgrade():
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tickets_last_vendor_contact_at'))
+        batch_op.drop_index(batch_op.f('ix_tickets_last_contact_at'))
+        batch_op.drop_column('last_vendor_contact_at')
+        batch_op.drop_column('last_contact_at')
@@ -0,0 +1,25 @@
+"""interactions timeline index
+
+Revision ID: b4e8d2f61a07
+Revises: 7d3c92e5a1f0
+Create Date: 2026-10-18 15:12:40.318207
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8d2f61a07'
+down_revision = '7d3c92e5a1f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('interactions', schema=None) as batch_op:
+        batch_op.create_index('ix_interactions_ticket_id_created_at_id', ['ticket_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('interactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_interactions_ticket_id_created_at_id')
@@ -0,0 +1,28 @@
+"""ticket import key
+
+Revision ID: c6f1a8e3b290
+Revises: 8e2d4b6a0c15
+Create Date: 2026-10-18 22:05:47.160233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a8e3b290'
+down_revision = '8e2d4b6a0c15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('import_key', sa.String(length=40), nullable=True))
+        batch_op.create_index(batch_op.f('ix_tickets_import_key'), ['import_key'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tickets_import_key'))
+        batch_op.drop_column('import_key')
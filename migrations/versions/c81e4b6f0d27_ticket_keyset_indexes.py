@@ -0,0 +1,29 @@
+"""ticket keyset indexes
+
+Revision ID: c81e4b6f0d27
+Revises: a3f1c9d2b7e4
+Create Date: 2026-10-18 10:03:12.551904
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81e4b6f0d27'
+down_revision = 'a3f1c9d2b7e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.create_index('ix_tickets_updated_at_id', ['updated_at', 'id'], unique=False)
+        batch_op.create_index('ix_tickets_created_by_updated_at_id', ['created_by', 'updated_at', 'id'], unique=False)
+        batch_op.create_index('ix_tickets_status_updated_at_id', ['status', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.drop_index('ix_tickets_status_updated_at_id')
+        batch_op.drop_index('ix_tickets_created_by_updated_at_id')
+        batch_op.drop_index('ix_tickets_updated_at_id')
@@ -0,0 +1,44 @@
+"""interactions ON DELETE CASCADE
+
+Revision ID: d7a3e9c50b12
+Revises: b4e8d2f61a07
+Create Date: 2026-10-18 16:02:17.904531
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3e9c50b12'
+down_revision = 'b4e8d2f61a07'
+branch_labels = None
+depends_on = None
+
+# A FK foi criada sem nome: no SQLite o batch a identifica por esta convenção,
+# no MySQL usamos o nome gerado pelo servidor (interactions_ibfk_N)
+NAMING = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+FK_NAME = 'fk_interactions_ticket_id_tickets'
+
+
+def _ticket_fk_name():
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys('interactions'):
+        if fk['referred_table'] == 'tickets':
+            return fk['name'] or FK_NAME
+    return None
+
+
+def _replace_fk(**kw):
+    old = _ticket_fk_name()
+    with op.batch_alter_table('interactions', schema=None, naming_convention=NAMING) as batch_op:
+        if old:
+            batch_op.drop_constraint(old, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'tickets', ['ticket_id'], ['id'], **kw)
+
+
+def upgrade():
+    _replace_fk(ondelete='CASCADE')
+
+
+def downgrade():
+    _replace_fk()
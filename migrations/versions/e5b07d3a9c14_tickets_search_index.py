@@ -0,0 +1,65 @@
+"""tickets search index
+
+Revision ID: e5b07d3a9c14
+Revises: c81e4b6f0d27
+Create Date: 2026-10-18 11:26:48.093377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b07d3a9c14'
+down_revision = 'c81e4b6f0d27'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK = 2000
+
+CREATE = {
+    'sqlite': (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tickets_search USING fts5("
+        "title, description, vendor, interactions, tokenize='unicode61 remove_diacritics 2')"
+    ),
+    'mysql': (
+        "CREATE TABLE IF NOT EXISTS tickets_search ("
+        "ticket_id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(200), description MEDIUMTEXT, "
+        "vendor VARCHAR(120), interactions MEDIUMTEXT, "
+        "FULLTEXT KEY ft_tickets_search (title, description, vendor, interactions)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    ),
+}
+
+BACKFILL = {
+    'sqlite': (
+        "INSERT INTO tickets_search(rowid, title, description, vendor, interactions) "
+        "SELECT t.id, t.title, coalesce(t.description, ''), coalesce(t.vendor, ''), "
+        "coalesce((SELECT group_concat(i.content, ' ') FROM interactions i WHERE i.ticket_id = t.id), '') "
+        "FROM tickets t WHERE t.id > :start AND t.id <= :end"
+    ),
+    'mysql': (
+        "INSERT INTO tickets_search(ticket_id, title, description, vendor, interactions) "
+        "SELECT t.id, t.title, coalesce(t.description, ''), coalesce(t.vendor, ''), "
+        "coalesce((SELECT group_concat(i.content SEPARATOR ' ') FROM interactions i WHERE i.ticket_id = t.id), '') "
+        "FROM tickets t WHERE t.id > :start AND t.id <= :end"
+    ),
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    if dialect not in CREATE:
+        # Outros bancos seguem com a busca ILIKE
+        return
+    op.execute(CREATE[dialect])
+    if dialect == 'mysql':
+        op.execute("SET SESSION group_concat_max_len = 16777216")
+    max_id = bind.execute(sa.text("SELECT max(id) FROM tickets")).scalar() or 0
+    for start in range(0, max_id, BACKFILL_CHUNK):
+        bind.execute(sa.text(BACKFILL[dialect]), {'start': start, 'end': start + BACKFILL_CHUNK})
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS tickets_search")
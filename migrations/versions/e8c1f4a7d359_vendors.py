@@ -0,0 +1,135 @@
+"""vendors
+
+Revision ID: e8c1f4a7d359
+Revises: d7a3e9c50b12
+Create Date: 2026-10-18 17:20:33.118264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c1f4a7d359'
+down_revision = 'd7a3e9c50b12'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK = 2000
+
+vendors = sa.table(
+    'vendors',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('key', sa.String),
+)
+tickets = sa.table(
+    'tickets',
+    sa.column('id', sa.Integer),
+    sa.column('vendor', sa.String),
+    sa.column('vendor_id', sa.Integer),
+    sa.column('last_vendor_contact_at', sa.DateTime),
+)
+interactions = sa.table(
+    'interactions',
+    sa.column('id', sa.Integer),
+    sa.column('ticket_id', sa.Integer),
+    sa.column('author', sa.String),
+    sa.column('vendor_id', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def _key(text):
+    # Mesma normalização de app/vendors.py:vendor_key
+    return ' '.join((text or '').split()).lower()[:120]
+
+
+def upgrade():
+    op.create_table('vendors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('key', sa.String(length=120), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    op.create_table('vendor_aliases',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('vendor_id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=120), nullable=False),
+    sa.ForeignKeyConstraint(['vendor_id'], ['vendors.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    with op.batch_alter_table('vendor_aliases', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_vendor_aliases_vendor_id'), ['vendor_id'], unique=False)
+
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('vendor_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_tickets_vendor_id'), ['vendor_id'], unique=False)
+        batch_op.create_foreign_key('fk_tickets_vendor_id_vendors', 'vendors', ['vendor_id'], ['id'])
+
+    with op.batch_alter_table('interactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('vendor_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_interactions_ticket_id_vendor_id_created_at', ['ticket_id', 'vendor_id', 'created_at'], unique=False)
+        batch_op.create_foreign_key('fk_interactions_vendor_id_vendors', 'vendors', ['vendor_id'], ['id'])
+
+    # Uma terceirizada por nome distinto (normalizado) dos chamados
+    bind = op.get_bind()
+    ids = {}
+    for (name,) in bind.execute(sa.select(tickets.c.vendor).distinct()):
+        key = _key(name)
+        if key and key not in ids:
+            ids[key] = len(ids) + 1  # tabela recém-criada
+            bind.execute(vendors.insert().values(id=ids[key], name=' '.join(name.split())[:120], key=key))
+    by_length = sorted(ids.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+    def match(author):
+        key = _key(author)
+        if key in ids:
+            return ids[key]
+        return next((vendor_id for name, vendor_id in by_length if name in key), None) if key else None
+
+    # Backfill em blocos de ids para não segurar locks longos
+    for table, source, resolve in ((tickets, tickets.c.vendor, lambda v: ids.get(_key(v))),
+                                   (interactions, interactions.c.author, match)):
+        set_vendor = table.update().where(table.c.id == sa.bindparam('_id')).values(vendor_id=sa.bindparam('_vendor_id'))
+        max_id = bind.execute(sa.select(sa.func.max(table.c.id))).scalar() or 0
+        for start in range(0, max_id, BACKFILL_CHUNK):
+            rows = bind.execute(sa.select(table.c.id, source)
+                                .where(table.c.id > start, table.c.id <= start + BACKFILL_CHUNK)).all()
+            updates = [{'_id': row_id, '_vendor_id': resolve(text)} for row_id, text in rows]
+            updates = [u for u in updates if u['_vendor_id'] is not None]
+            if updates:
+                bind.execute(set_vendor, updates)
+
+    last_vendor = (sa.select(sa.func.max(interactions.c.created_at))
+                   .where(interactions.c.ticket_id == tickets.c.id,
+                          interactions.c.vendor_id == tickets.c.vendor_id)
+                   .scalar_subquery())
+    max_id = bind.execute(sa.select(sa.func.max(tickets.c.id))).scalar() or 0
+    for start in range(0, max_id, BACKFILL_CHUNK):
+        bind.execute(
+            tickets.update()
+            .where(tickets.c.id > start, tickets.c.id <= start + BACKFILL_CHUNK)
+            .values(last_vendor_contact_at=last_vendor)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('interactions', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_interactions_vendor_id_vendors', type_='foreignkey')
+        batch_op.drop_index('ix_interactions_ticket_id_vendor_id_created_at')
+        batch_op.drop_column('vendor_id')
+
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_tickets_vendor_id_vendors', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_tickets_vendor_id'))
+        batch_op.drop_column('vendor_id')
+
+    with op.batch_alter_table('vendor_aliases', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_vendor_aliases_vendor_id'))
+
+    op.drop_table('vendor_aliases')
+    op.drop_table('vendors')
@@ -0,0 +1,38 @@
+"""ticket changes
+
+Revision ID: f0b6c3d8e271
+Revises: e8c1f4a7d359
+Create Date: 2026-10-18 18:41:05.572390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0b6c3d8e271'
+down_revision = 'e8c1f4a7d359'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_changes',
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(length=12), nullable=False),
+    sa.Column('interaction_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('seq'),
+    sqlite_autoincrement=True
+    )
+    with op.batch_alter_table('ticket_changes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ticket_changes_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket_changes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_changes_created_at'))
+
+    op.drop_table('ticket_changes')
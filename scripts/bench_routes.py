@@ -0,0 +1,211 @@
+"""Micro-benchmark das rotas mais usadas pelo test client do Flask.
+
+Gera dados com app.seed num SQLite temporário (ou usa --database-url) e mede
+login, listagem, detalhe, nova interação e exportações: percentis de
+latência, número de consultas SQL por requisição e pico de memória
+(tracemalloc, numa execução à parte para não distorcer os tempos).
+
+Uso:
+    python -m scripts.bench_routes --tickets 20000 --save-baseline scripts/bench_baseline.json
+    python -m scripts.bench_routes --tickets 20000 --baseline scripts/bench_baseline.json
+
+Com --baseline, sai com código 1 se alguma rota ficar mais lenta que a
+tolerância (p50 e pico de memória) ou fizer mais consultas que o registrado.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def login_client(app, email, password):
+    client = app.test_client()
+    resp = client.post('/login', data={'email': email, 'password': password})
+    if resp.status_code != 302:
+        raise SystemExit(f'login falhou para {email}: {resp.status_code}')
+    return client
+
+
+def scenarios(app, admin, user, ticket_ids, password, rng):
+    """(nome, função que faz uma requisição e retorna a resposta, repetições relativas)."""
+    def login():
+        return app.test_client().post('/login', data={'email': user[1], 'password': password})
+
+    def detail():
+        return admin_client.get(f'/tickets/{rng.choice(ticket_ids)}')
+
+    def add_interaction():
+        return admin_client.post(f'/tickets/{rng.choice(ticket_ids)}/interactions', data={
+            'content': 'Retorno do fornecedor sobre a nota fiscal', 'author': 'Suporte TOTVS',
+            'created_at': '2024-06-01T10:00'})
+
+    admin_client = login_client(app, admin[1], password)
+    user_client = login_client(app, user[1], password)
+    return [
+        ('login', login, 1),
+        ('index (admin)', lambda: admin_client.get('/'), 1),
+        ('index (usuário)', lambda: user_client.get('/'), 1),
+        ('index busca', lambda: admin_client.get('/?q=impressora servidor'), 1),
+        ('ticket_detail', detail, 1),
+        ('interaction_add', add_interaction, 1),
+        ('export_csv (usuário)', lambda: user_client.get('/export/csv'), 0),
+        ('export_xlsx (usuário)', lambda: user_client.get('/export/xlsx'), 0),
+        ('export_csv (admin)', lambda: admin_client.get('/export/csv'), 0),
+    ]
+
+
+def measure(fn, repeat, counter):
+    samples, queries, statuses = [], [], set()
+    for _ in range(repeat):
+        counter.count = 0
+        started = time.perf_counter()
+        resp = fn()
+        resp.get_data()  # consome respostas em streaming
+        samples.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+        statuses.add(resp.status_code)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn().get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': percentile(samples, 50),
+        'p90_ms': percentile(samples, 90),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': max(samples),
+        'queries': statistics.median(queries),
+        'peak_kb': peak / 1024,
+        'status': sorted(statuses),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Lista de (rota, métrica, atual, base) que pioraram além da tolerância."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ('p50_ms', 'peak_kb'):
+            if current[metric] > base[metric] * (1 + tolerance):
+                regressions.append((name, metric, current[metric], base[metric]))
+        if current['queries'] > base['queries']:
+            regressions.append((name, 'queries', current['queries'], base['queries']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', help='banco já populado (pula o seed se houver chamados)')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--tickets', type=int, default=20_000)
+    parser.add_argument('--interactions-per-ticket', default='0-20')
+    parser.add_argument('--password', default='senha123')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--export-repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cache', action='store_true', help='mantém o cache da listagem (padrão: null://)')
+    parser.add_argument('--baseline', help='JSON para comparar')
+    parser.add_argument('--save-baseline', help='grava os resultados neste JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='piora relativa aceita (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    if not args.cache:
+        os.environ['RESULT_CACHE_URL'] = 'null://'
+    os.environ.pop('OUTBOX_WORKER_THREAD', None)
+
+    from sqlalchemy import func, select
+    from app import create_app
+    from app.extensions import db
+    from app.models import Ticket, User
+    from app.search import Fts5Backend, get_backend, reset_backend_cache
+    from app.seed import parse_range, seed
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    rng = random.Random(args.seed)
+    with app.app_context():
+        if not args.database_url:
+            db.create_all()
+            if db.engine.dialect.name == 'sqlite':
+                with db.engine.begin() as connection:
+                    Fts5Backend().create(connection)
+                reset_backend_cache()
+        if not db.session.scalar(select(func.count(Ticket.id))):
+            started = time.perf_counter()
+            backend = get_backend(db.engine)
+            with db.engine.begin() as connection:
+                counts = seed(connection, backend, args.users, args.tickets,
+                              parse_range(args.interactions_per_ticket), password=args.password,
+                              rng=random.Random(args.seed))
+            print(f"seed: {counts['tickets']} chamados, {counts['interactions']} interações "
+                  f"em {time.perf_counter() - started:.1f}s")
+
+        admin = db.session.execute(select(User.id, User.email).where(User.role == 'admin').order_by(User.id)).first()
+        # Usuário comum com mais chamados: pior caso da listagem filtrada
+        user = db.session.execute(
+            select(User.id, User.email).join(Ticket, Ticket.created_by == User.id)
+            .where(User.role != 'admin').group_by(User.id, User.email)
+            .order_by(func.count(Ticket.id).desc()).limit(1)).first()
+        ticket_ids = db.session.scalars(select(Ticket.id).order_by(func.random()).limit(500)).all()
+        db.session.remove()
+        counter = QueryCounter(db.engine)
+    if not admin or not user:
+        raise SystemExit('o banco precisa de um admin e de um usuário comum com chamados')
+
+    results = {}
+    print(f"{'rota':<24}{'p50':>9}{'p90':>9}{'p99':>9}{'máx':>9}{'SQL':>6}{'pico KB':>10}")
+    for name, fn, weight in scenarios(app, admin, user, ticket_ids, args.password, rng):
+        repeat = args.repeat if weight else args.export_repeat
+        with app.app_context():
+            r = results[name] = measure(fn, repeat, counter)
+        print(f"{name:<24}{r['p50_ms']:>9.1f}{r['p90_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}"
+              f"{r['queries']:>6.0f}{r['peak_kb']:>10.0f}  {r['status']}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as fh:
+            json.dump({'args': vars(args), 'results': results}, fh, indent=2, default=str)
+        print(f'baseline gravada em {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for name, metric, current, base in regressions:
+            print(f'REGRESSÃO {name} {metric}: {current:.1f} (base {base:.1f})')
+        if regressions:
+            sys.exit(1)
+        print('sem regressões em relação à baseline')
+
+
+if __name__ == '__main__':
+    main()
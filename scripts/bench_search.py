@@ -0,0 +1,99 @@
+"""Compara a busca ILIKE com o índice textual (FTS5) em um SQLite temporário.
+
+Uso: python -m scripts.bench_search [--tickets 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+WORDS = ('nota fiscal erro integração faturamento estoque relatório acesso senha servidor '
+         'lentidão impressora backup contrato boleto cadastro cliente fornecedor pedido '
+         'manutenção atualização versão banco dados rede firewall licença usuário').split()
+QUERIES = ['impressora', 'nota fiscal', 'firewall licença', 'servidor lentidão backup']
+
+
+# Vocabulário sintético grande; termos de domínio aparecem em ~2% das palavras
+FILLER = [f'pal{i}' for i in range(5000)]
+
+
+def sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) if rng.random() < 0.02 else rng.choice(FILLER) for _ in range(n))
+
+
+def seed(connection, n_tickets, rng):
+    from app.models import User, Ticket, Interaction
+    connection.execute(User.__table__.insert(), [{
+        'id': 1, 'name': 'Bench', 'email': 'bench@example.com', 'password_hash': '-', 'role': 'admin', 'is_active': True,
+    }])
+    base = datetime(2024, 1, 1)
+    batch, inter = [], []
+    for i in range(1, n_tickets + 1):
+        ts = base + timedelta(minutes=i)
+        batch.append({
+            'id': i, 'title': sentence(rng, 5), 'description': sentence(rng, 40), 'status': 'aberto',
+            'priority': 'media', 'vendor': rng.choice(['TOTVS', 'Acme', 'Infra']), 'created_by': 1,
+            'created_at': ts, 'updated_at': ts, 'last_contact_at': ts,
+        })
+        inter.append({'ticket_id': i, 'content': sentence(rng, 20), 'author': 'Suporte', 'created_at': ts})
+        if len(batch) >= 5000:
+            connection.execute(Ticket.__table__.insert(), batch)
+            connection.execute(Interaction.__table__.insert(), inter)
+            batch, inter = [], []
+    if batch:
+        connection.execute(Ticket.__table__.insert(), batch)
+        connection.execute(Interaction.__table__.insert(), inter)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickets', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from app import create_app
+    from app.extensions import db
+    from app.models import Ticket
+    from app.search import Fts5Backend, LikeBackend, rebuild, reset_backend_cache
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            seed(connection, args.tickets, random.Random(42))
+        print(f'seed: {args.tickets} chamados em {time.perf_counter() - started:.1f}s')
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            rebuild(connection, Fts5Backend())
+        reset_backend_cache()
+        print(f'índice FTS5: {time.perf_counter() - started:.1f}s')
+
+        print(f"{'consulta':<28}{'like (ms)':>12}{'fts5 (ms)':>12}{'linhas':>10}")
+        for q in QUERIES:
+            results = {}
+            for backend in (LikeBackend(), Fts5Backend()):
+                query, score = backend.apply(Ticket.query, q)
+                order = [score.desc(), Ticket.id.desc()] if score is not None else [Ticket.updated_at.desc()]
+                results[backend.name] = timed(lambda: query.order_by(*order).limit(50).all(), args.repeat)[0]
+            rows = Fts5Backend().apply(Ticket.query, q)[0].count()
+            print(f"{q:<28}{results['like']:>12.1f}{results['fts5']:>12.1f}{rows:>10}")
+
+
+if __name__ == '__main__':
+    main()
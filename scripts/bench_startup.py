@@ -0,0 +1,119 @@
+"""Mede o custo de subir um worker: import do pacote, create_app() e memória.
+
+Cada amostra roda em um processo Python novo (import a frio, como um worker
+do gunicorn recém-criado). Com --importtime, lista os módulos mais caros.
+
+Uso: python -m scripts.bench_startup [--runs 5] [--path /login] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource  # fora do Linux: pico de memória
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+sample = {'base_rss_mb': rss_mb()}
+started = time.perf_counter()
+import app
+sample['import_ms'] = (time.perf_counter() - started) * 1000
+started = time.perf_counter()
+flask_app = app.create_app()
+sample['create_app_ms'] = (time.perf_counter() - started) * 1000
+sample['rss_mb'] = rss_mb()
+path = sys.argv[1]
+if path:
+    started = time.perf_counter()
+    status = flask_app.test_client().get(path).status_code
+    sample['first_request_ms'] = (time.perf_counter() - started) * 1000
+    sample['status'] = status
+    sample['rss_after_request_mb'] = rss_mb()
+sample['modules'] = len(sys.modules)
+print(json.dumps(sample))
+'''
+
+METRICS = (
+    ('import_ms', 'import app (ms)'),
+    ('create_app_ms', 'create_app() (ms)'),
+    ('first_request_ms', '1ª requisição (ms)'),
+    ('base_rss_mb', 'RSS do interpretador (MB)'),
+    ('rss_mb', 'RSS após create_app (MB)'),
+    ('rss_after_request_mb', 'RSS após 1ª requisição (MB)'),
+    ('modules', 'módulos carregados'),
+)
+
+
+def child_env():
+    env = dict(os.environ)
+    # create_app() não conecta ao banco; um SQLite vazio basta para a 1ª requisição
+    env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_startup.db')}")
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    env.pop('OUTBOX_WORKER_THREAD', None)
+    return env
+
+
+def run_sample(path, importtime=False):
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD, path]
+    proc = subprocess.run(cmd, cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(stderr, top):
+    """Linhas de `-X importtime` -> [(cumulativo_ms, módulo)] até 3 níveis de profundidade."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 3:
+            entries.append((int(cumulative) / 1000, name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/login', help="rota da 1ª requisição ('' para pular)")
+    parser.add_argument('--importtime', action='store_true', help='lista os imports mais lentos')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='imprime as amostras em JSON')
+    args = parser.parse_args()
+
+    samples = [run_sample(args.path)[0] for _ in range(args.runs)]
+    if args.json:
+        print(json.dumps(samples, indent=2))
+        return
+
+    print(f"{'métrica':<30}{'mediana':>10}{'mín':>10}{'máx':>10}")
+    for key, label in METRICS:
+        values = [s[key] for s in samples if key in s]
+        if values:
+            print(f'{label:<30}{statistics.median(values):>10.1f}{min(values):>10.1f}{max(values):>10.1f}')
+
+    if args.importtime:
+        _, stderr = run_sample(args.path, importtime=True)
+        print(f"\n{'import (cumulativo)':<60}{'ms':>10}")
+        for ms, name in slowest_imports(stderr, args.top):
+            print(f'{name:<60}{ms:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()